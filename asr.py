@@ -0,0 +1,182 @@
+"""Распознавание речи с подключаемыми движками.
+
+google — облачный Google Speech Recognition (через speech_recognition);
+vosk — полностью локальный движок на CPU с промежуточными гипотезами
+(нужны `pip install vosk` и русская модель, например vosk-model-small-ru).
+
+Замер скорости на записи (коэффициент реального времени, RTF < 1 —
+быстрее реального времени):
+    python asr.py запись.wav --backend vosk --model models/vosk-model-small-ru-0.22
+"""
+import argparse
+import json
+import time
+from abc import ABC, abstractmethod
+
+
+class ASRStream(ABC):
+    """Поток распознавания одной фразы: звук подаётся кадрами по мере записи."""
+
+    @abstractmethod
+    def accept(self, pcm):
+        """Принимает кадр 16-битного моно PCM. Возвращает новую промежуточную гипотезу или None."""
+
+    @abstractmethod
+    def reset(self):
+        """Сбрасывает накопленный звук (фраза оказалась шумом)."""
+
+    @abstractmethod
+    def finish(self):
+        """Завершает фразу и возвращает окончательный текст (пустая строка — ничего не распознано)."""
+
+
+class ASRBackend(ABC):
+    name = "base"
+    streaming = False  # отдаёт ли движок промежуточные гипотезы
+
+    @abstractmethod
+    def open_stream(self, sample_rate):
+        """Открывает поток распознавания новой фразы (ASRStream)."""
+
+    def transcribe(self, pcm, sample_rate, frame_bytes=8000):
+        """Распознаёт готовый фрагмент, подавая его кадрами как при живой записи."""
+        stream = self.open_stream(sample_rate)
+        for offset in range(0, len(pcm), frame_bytes):
+            stream.accept(pcm[offset:offset + frame_bytes])
+        return stream.finish()
+
+
+class _GoogleStream(ASRStream):
+    def __init__(self, recognizer, sample_rate, language):
+        self._recognizer = recognizer
+        self._sample_rate = sample_rate
+        self._language = language
+        self._frames = []
+
+    def accept(self, pcm):
+        self._frames.append(pcm)
+        return None
+
+    def reset(self):
+        self._frames = []
+
+    def finish(self):
+        import speech_recognition as sr
+        audio = sr.AudioData(b"".join(self._frames), self._sample_rate, 2)
+        self._frames = []
+        try:
+            return self._recognizer.recognize_google(audio, language=self._language)
+        except sr.UnknownValueError:
+            return ""
+
+
+class GoogleBackend(ASRBackend):
+    """Облачное распознавание: звук копится и отправляется целиком в конце фразы."""
+
+    name = "google"
+
+    def __init__(self, language="ru-RU"):
+        import speech_recognition as sr
+        self._recognizer = sr.Recognizer()
+        self.language = language
+
+    def open_stream(self, sample_rate):
+        return _GoogleStream(self._recognizer, sample_rate, self.language)
+
+
+class _VoskStream(ASRStream):
+    def __init__(self, model, sample_rate):
+        from vosk import KaldiRecognizer
+        self._recognizer = KaldiRecognizer(model, sample_rate)
+        self._final_parts = []
+        self._last_partial = ""
+
+    def accept(self, pcm):
+        if self._recognizer.AcceptWaveform(pcm):
+            # Движок сам нашёл конец высказывания внутри фразы
+            text = json.loads(self._recognizer.Result()).get("text", "")
+            if text:
+                self._final_parts.append(text)
+            self._last_partial = ""
+            return " ".join(self._final_parts) or None
+        partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        if partial and partial != self._last_partial:
+            self._last_partial = partial
+            return " ".join(self._final_parts + [partial])
+        return None
+
+    def reset(self):
+        self._recognizer.Reset()
+        self._final_parts = []
+        self._last_partial = ""
+
+    def finish(self):
+        text = json.loads(self._recognizer.FinalResult()).get("text", "")
+        parts = self._final_parts + ([text] if text else [])
+        self._final_parts = []
+        self._last_partial = ""
+        return " ".join(parts)
+
+
+class VoskBackend(ASRBackend):
+    """Локальное распознавание на CPU: звук обрабатывается по мере поступления."""
+
+    name = "vosk"
+    streaming = True
+
+    def __init__(self, model_path):
+        try:
+            from vosk import Model, SetLogLevel
+        except ImportError:
+            raise RuntimeError("Для локального распознавания установите пакет vosk: pip install vosk")
+        SetLogLevel(-1)
+        self._model = Model(model_path)
+
+    def open_stream(self, sample_rate):
+        return _VoskStream(self._model, sample_rate)
+
+
+def create_backend(name, model_path=None, language="ru-RU"):
+    """Создаёт движок распознавания по имени."""
+    if name == "google":
+        return GoogleBackend(language)
+    if name == "vosk":
+        if not model_path:
+            raise RuntimeError("Для vosk укажите путь к модели")
+        return VoskBackend(model_path)
+    raise ValueError(f"Неизвестный движок распознавания: {name}")
+
+
+def benchmark(backend, path):
+    """Прогоняет WAV-файл через разбиение на фразы и движок, печатает RTF."""
+    from capture import CaptureEngine, WavFileSource
+
+    engine = CaptureEngine(WavFileSource(path, realtime=False))
+    audio_seconds = 0.0
+    processing = 0.0
+    count = 0
+    while True:
+        segment = engine.next_segment()
+        if segment is None:
+            break
+        started = time.perf_counter()
+        text = backend.transcribe(segment.pcm, segment.sample_rate)
+        elapsed = time.perf_counter() - started
+        count += 1
+        audio_seconds += segment.duration()
+        processing += elapsed
+        print(f"🔊 [{segment.started_at:.1f}с] {text or '—'} (RTF {elapsed / segment.duration():.2f})")
+    engine.close()
+    rtf = processing / audio_seconds if audio_seconds else 0.0
+    print(f"📊 {backend.name}: фраз {count}, речи {audio_seconds:.1f}с, "
+          f"распознавание {processing:.1f}с, RTF {rtf:.2f}")
+    return rtf
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замер скорости распознавания на записи")
+    parser.add_argument("wav", help="16-битный WAV-файл")
+    parser.add_argument("--backend", default="vosk", choices=["google", "vosk"])
+    parser.add_argument("--model", help="путь к модели vosk")
+    args = parser.parse_args()
+    benchmark(create_backend(args.backend, args.model), args.wav)
@@ -0,0 +1,174 @@
+"""Пакетная сборка презентации из расшифровки доклада без микрофона.
+
+Пример:
+    python batch.py lecture.txt -o lecture.pptx --workers 4 \
+        --endpoint http://gpu1:11434/api/generate --endpoint http://gpu2:11434/api/generate
+"""
+import argparse
+import io
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from pptx import Presentation
+
+import main
+from persistence import atomic_write
+from theme import apply_deck_theme
+
+
+def read_transcript(path):
+    """Читает фразы из файла.
+
+    .jsonl — по одной фразе в строке (строка JSON или объект с полем "text");
+    обычный текст делится на фразы пустыми строками, а если их нет — по строкам.
+    """
+    with open(path, encoding="utf-8") as f:
+        raw = f.read()
+
+    if path.endswith(".jsonl"):
+        utterances = []
+        for line_number, line in enumerate(raw.splitlines(), 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                print(f"⚠️ Строка {line_number}: некорректный JSON, пропускаем")
+                continue
+            text = item.get("text", "") if isinstance(item, dict) else str(item)
+            if text.strip():
+                utterances.append(text.strip())
+        return utterances
+
+    blocks = [block for block in raw.split("\n\n") if block.strip()]
+    if len(blocks) > 1:
+        return [" ".join(block.split()) for block in blocks]
+    return [line.strip() for line in raw.splitlines() if line.strip()]
+
+
+def load_checkpoint(path):
+    """Загружает уже готовые слайды: {номер фразы: запись}."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Недописанная строка после сбоя
+                break
+            done[entry["index"]] = entry
+    return done
+
+
+def build_deck(utterances, output, endpoints, workers=2, resume=False, retries=2):
+    """Генерирует слайды для всех фраз и сохраняет презентацию один раз в конце.
+
+    Запросы распределяет собственный клиент Ollama (main.OllamaClient): каждый
+    уходит на наименее загруженный сервер из endpoints. Слайд, собранный из
+    заглушек (ошибка или таймаут запроса), генерируется заново до retries
+    раз; если не вышел и тогда, он попадает в презентацию как есть, но не
+    в контрольную точку — запуск с --resume сгенерирует его снова.
+    """
+    # На каждый слайд — до двух параллельных запросов (контент и дизайн)
+    client = main.OllamaClient(endpoints, workers=max(8, workers * 2))
+    checkpoint_path = output + ".checkpoint.jsonl"
+    done = load_checkpoint(checkpoint_path) if resume else {}
+    if done:
+        print(f"♻️ Продолжаем с контрольной точки: готово {len(done)} из {len(utterances)}")
+    elif os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    todo = [i for i in range(len(utterances)) if i not in done]
+    failed = {}  # номер фразы → запись со слайдом-заглушкой
+    attempts = dict.fromkeys(todo, 0)
+    started = time.perf_counter()
+    completed = 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        def submit(i):
+            attempts[i] += 1
+            # В режиме темы дизайн нужен только первому слайду
+            return pool.submit(main.generate_slide_data, utterances[i], None, None,
+                               not main.DECK_THEME_ENABLED or i == 0, client)
+
+        futures = {submit(i): i for i in todo}
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = futures.pop(future)
+                title, content, design_suggestions = future.result()
+                entry = main.slide_to_journal(title, content, design_suggestions)
+                entry["index"] = i
+                if main.is_placeholder_slide(title, content, design_suggestions):
+                    if attempts[i] <= retries:
+                        print(f"🔁 Фраза {i + 1}: «{title}», повтор {attempts[i]} из {retries}")
+                        futures[submit(i)] = i
+                    else:
+                        print(f"❌ Фраза {i + 1}: «{title}» после {attempts[i]} попыток")
+                        failed[i] = entry
+                    continue
+                done[i] = entry
+                checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+                completed += 1
+                elapsed = time.perf_counter() - started
+                print(f"✅ [{len(done)}/{len(utterances)}] {title} — {completed / elapsed * 60:.1f} слайдов/мин")
+
+    print("\n🛠️ Сборка презентации...")
+    prs = Presentation()
+    for i in range(len(utterances)):
+        title, content, design_suggestions = main.slide_from_journal(done.get(i) or failed[i])
+        if main.DECK_THEME_ENABLED and i == 0:
+            apply_deck_theme(prs, main.resolve_design(design_suggestions))
+            design_suggestions = None
+        main.create_slide(prs, title, content, design_suggestions)
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    atomic_write(output, buffer.getvalue())
+    if not failed:
+        os.remove(checkpoint_path)
+
+    elapsed = time.perf_counter() - started
+    rate = completed / elapsed * 60 if elapsed else 0.0
+    print(f"\n💾 Сохранено {len(utterances)} слайдов в {output}")
+    print(f"📊 Сгенерировано {completed} слайдов за {elapsed:.1f}с ({rate:.1f} слайдов/мин)")
+    if failed:
+        numbers = ", ".join(str(i + 1) for i in sorted(failed))
+        print(f"⚠️ Не сгенерированы слайды для фраз {numbers}: в презентации заглушки. "
+              f"Повторите запуск с --resume, чтобы сгенерировать только их")
+    for endpoint in client.endpoints.stats()["endpoints"]:
+        print(f"   • {endpoint['url']}: запросов {endpoint['requests']}, ошибок {endpoint['failures']}")
+    client.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная генерация презентации из расшифровки")
+    parser.add_argument("transcript", help="файл .txt или .jsonl с фразами докладчика")
+    parser.add_argument("-o", "--output", default=main.PPTX_FILE, help="куда сохранить .pptx")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="число одновременных генераций")
+    parser.add_argument("--endpoint", action="append", dest="endpoints",
+                        help="адрес /api/generate сервера Ollama (можно указать несколько раз)")
+    parser.add_argument("--resume", action="store_true", help="продолжить с контрольной точки")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="сколько раз повторять слайд, если модель ответила ошибкой")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    endpoints = args.endpoints or [main.OLLAMA_URL]
+    endpoints = [url for url in endpoints if main.check_ollama(url)]
+    utterances = read_transcript(args.transcript)
+    if not endpoints:
+        print("‼️ Нет доступных серверов Ollama")
+    elif not utterances:
+        print("В расшифровке нет фраз")
+    else:
+        print(f"🟢 Фраз: {len(utterances)}, потоков: {args.workers}, серверов: {len(endpoints)}")
+        build_deck(utterances, args.output, endpoints, args.workers, args.resume, args.retries)
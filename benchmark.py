@@ -0,0 +1,125 @@
+"""Замер задержек цикла «генерация → создание слайда → сохранение».
+
+По умолчанию поднимает локальную замену Ollama (ollama_stub.py), так что
+результаты воспроизводимы без GPU и сети. Пример:
+    python benchmark.py --slides 300 --latency 0.05 --token-rate 200
+    python benchmark.py --url http://localhost:11434/api/generate --utterances lecture.txt
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+from pptx import Presentation
+
+import main
+from metrics import peak_rss_mb
+from ollama_stub import start_stub
+from persistence import atomic_write
+from theme import apply_deck_theme
+
+DEFAULT_UTTERANCES = [
+    "Сегодня мы поговорим о том, как устроены нейронные сети и почему они так популярны",
+    "Машинное обучение начинается с данных: их нужно собрать, очистить и разметить",
+    "Отдельно остановимся на обработке естественного языка и больших языковых моделях",
+    "Компьютерное зрение позволяет распознавать объекты на изображениях и видео",
+    "В конце обсудим, как внедрять модели в реальные продукты и следить за качеством",
+]
+
+
+def percentile(values, q):
+    """Перцентиль q (0..100) методом ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def run_benchmark(utterances, slides, output, report_every=50):
+    """Прогоняет slides фраз через полный цикл и возвращает замеры по этапам."""
+    stages = {}
+    prs = Presentation()
+    started = time.perf_counter()
+
+    for n in range(slides):
+        text = utterances[n % len(utterances)]
+        timings = {}
+        # Как и в живом цикле: в режиме темы дизайн запрашивается один раз
+        with_design = not main.DECK_THEME_ENABLED or n == 0
+        title, content, design_suggestions = main.generate_slide_data(text, timings, with_design=with_design)
+
+        render_started = time.perf_counter()
+        if main.DECK_THEME_ENABLED and n == 0:
+            apply_deck_theme(prs, main.resolve_design(design_suggestions))
+            design_suggestions = None
+        main.create_slide(prs, title, content, design_suggestions)
+        timings["render"] = time.perf_counter() - render_started
+
+        save_started = time.perf_counter()
+        buffer = io.BytesIO()
+        prs.save(buffer)
+        atomic_write(output, buffer.getvalue())
+        timings["save"] = time.perf_counter() - save_started
+
+        for stage, seconds in timings.items():
+            stages.setdefault(stage, []).append(seconds)
+        if (n + 1) % report_every == 0:
+            print(f"📈 Слайдов: {n + 1}, сохранение {timings['save'] * 1000:.0f} мс, "
+                  f"файл {len(buffer.getvalue()) / 1024:.0f} КБ, пик RSS {peak_rss_mb():.0f} МБ",
+                  file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    return stages, elapsed
+
+
+def print_report(stages, elapsed, slides):
+    print(f"\n{'этап':<12}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'n':>6}")
+    for stage, values in stages.items():
+        print(f"{stage:<12}{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}{len(values):>6}")
+    print(f"\nСлайдов: {slides} за {elapsed:.1f}с — {slides / elapsed:.2f} слайдов/с")
+    print(f"Пиковый RSS: {peak_rss_mb():.0f} МБ")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Замер задержек по этапам генерации слайда")
+    parser.add_argument("--slides", type=int, default=100, help="сколько слайдов сгенерировать")
+    parser.add_argument("--utterances", help="файл с фразами (.txt или .jsonl, как для batch.py)")
+    parser.add_argument("--url", help="настоящий сервер Ollama вместо локальной замены")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка замены до первого токена, с")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="скорость замены, токенов/с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ошибок замены")
+    parser.add_argument("--cache", action="store_true", help="не отключать кэш ответов")
+    parser.add_argument("--report-every", type=int, default=50, help="как часто печатать рост презентации")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.utterances:
+        from batch import read_transcript
+        utterances = read_transcript(args.utterances)
+    else:
+        utterances = DEFAULT_UTTERANCES
+
+    if args.url:
+        main.OLLAMA_URL = args.url
+    else:
+        _, main.OLLAMA_URL = start_stub(latency=args.latency, token_rate=args.token_rate,
+                                        error_rate=args.error_rate, seed=0)
+    main.CACHE_ENABLED = args.cache
+
+    # Подробный вывод генерации не мешает отчёту
+    output = os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.pptx")
+    log = open(os.devnull, "w")
+    stdout = sys.stdout
+    sys.stdout = log
+    try:
+        stages, elapsed = run_benchmark(utterances, args.slides, output, args.report_every)
+    finally:
+        sys.stdout = stdout
+        log.close()
+    print_report(stages, elapsed, args.slides)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Кэш ответов по содержимому запроса: LRU в памяти поверх SQLite на диске.
+
+    Ключ — SHA-256 от канонического JSON запроса, значение — любой
+    JSON-сериализуемый объект. Записи старше ttl секунд считаются
+    устаревшими; на диске хранится не более max_disk_entries записей
+    (вытесняются давно не использованные).
+    """
+
+    def __init__(self, path, max_memory_entries=256, max_disk_entries=5000, ttl=7 * 24 * 3600):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    "key TEXT PRIMARY KEY, value TEXT, created_at REAL, accessed_at REAL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Дисковый кэш недоступен ({e}), работаем только в памяти")
+                self._db = None
+
+    @staticmethod
+    def make_key(namespace, request):
+        """Строит ключ из пространства имён и параметров запроса."""
+        canonical = json.dumps([namespace, request], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Возвращает значение по ключу или None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if now - row[1] <= self.ttl:
+                        self._db.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        value = json.loads(row[0])
+                        self._remember(key, row[1], value)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Сохраняет значение в памяти и на диске."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now)
+                )
+                # Вытесняем давно не использованные записи сверх лимита
+                self._db.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Не удалось записать в дисковый кэш: {e}")
+
+    def _remember(self, key, created_at, value):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        """Счётчики попаданий и промахов."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def open_cache(path, **limits):
+    """Открывает кэш, создавая каталог для файла при необходимости."""
+    directory = os.path.dirname(path) if path else ""
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return ResponseCache(path, **limits)
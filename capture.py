@@ -0,0 +1,370 @@
+"""Непрерывный захват звука с разбиением на фразы по паузам (VAD).
+
+Устройство открывается один раз, уровень шума калибруется один раз при
+старте и затем подстраивается в фоне по тихим фрагментам. Вместо
+микрофона можно подать WAV-файл — так захват проверяется и замеряется на
+сервере без звуковой карты:
+    python capture.py lecture.wav
+"""
+import array
+import math
+import sys
+import threading
+import time
+import wave
+from collections import deque
+
+
+class AudioSegment:
+    """Фрагмент речи: 16-битный моно PCM и его положение в потоке."""
+
+    def __init__(self, pcm, sample_rate, started_at, ended_at, detected_at):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.sample_width = 2
+        self.started_at = started_at  # секунды от начала потока
+        self.ended_at = ended_at
+        self.detected_at = detected_at  # time.monotonic(), когда замечена пауза
+
+    def duration(self):
+        return self.ended_at - self.started_at
+
+
+def _to_mono(pcm, channels):
+    if channels == 1:
+        return pcm
+    samples = array.array("h", pcm)
+    mono = array.array("h", (
+        sum(samples[i:i + channels]) // channels for i in range(0, len(samples), channels)
+    ))
+    return mono.tobytes()
+
+
+def rms(pcm):
+    """Среднеквадратичная амплитуда 16-битного PCM."""
+    samples = array.array("h", pcm)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class WavFileSource:
+    """WAV-файл вместо микрофона. realtime=True отдаёт звук со скоростью записи."""
+
+    def __init__(self, path, frame_ms=30, realtime=True):
+        self.path = path
+        self.realtime = realtime
+        self._wave = wave.open(path, "rb")
+        if self._wave.getsampwidth() != 2:
+            raise ValueError(f"{path}: поддерживается только 16-битный PCM")
+        self.channels = self._wave.getnchannels()
+        self.sample_rate = self._wave.getframerate()
+        self.frame_samples = max(1, self.sample_rate * frame_ms // 1000)
+        self._started = None
+        self._position = 0
+
+    def read(self):
+        """Возвращает следующий кадр моно PCM или None в конце файла."""
+        if self._started is None:
+            self._started = time.monotonic()
+        pcm = self._wave.readframes(self.frame_samples)
+        if not pcm:
+            return None
+        self._position += len(pcm) // (2 * self.channels)
+        if self.realtime:
+            ahead = self._position / self.sample_rate - (time.monotonic() - self._started)
+            if ahead > 0:
+                time.sleep(ahead)
+        return _to_mono(pcm, self.channels)
+
+    def close(self):
+        self._wave.close()
+
+
+class ChunkSource:
+    """Звук, приходящий кусками по сети (16-битный моно PCM произвольной длины).
+
+    feed() дописывает кусок в буфер, read() блокируется до накопления кадра.
+    max_buffered_seconds ограничивает буфер: если распознавание не успевает,
+    feed() возвращает False, и клиенту стоит притормозить.
+    """
+
+    def __init__(self, sample_rate, frame_ms=30, max_buffered_seconds=10):
+        self.sample_rate = sample_rate
+        self.frame_samples = max(1, sample_rate * frame_ms // 1000)
+        self._frame_bytes = self.frame_samples * 2
+        self._max_bytes = int(max_buffered_seconds * sample_rate) * 2
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def feed(self, pcm):
+        with self._cond:
+            if self._closed or len(self._buffer) + len(pcm) > self._max_bytes:
+                return False
+            self._buffer += pcm
+            self._cond.notify_all()
+            return True
+
+    def buffered_seconds(self):
+        with self._cond:
+            return len(self._buffer) / 2 / self.sample_rate
+
+    def read(self):
+        """Возвращает следующий кадр или None, когда источник закрыт и буфер пуст."""
+        with self._cond:
+            while len(self._buffer) < self._frame_bytes and not self._closed:
+                self._cond.wait()
+            if not self._buffer:
+                return None
+            size = min(self._frame_bytes, len(self._buffer) - len(self._buffer) % 2)
+            if size == 0:
+                self._buffer.clear()
+                return None
+            frame = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return frame
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class BufferedSource:
+    """Источник, который читается в отдельном потоке без пауз.
+
+    Микрофон (PyAudio с exception_on_overflow=False) молча выбрасывает
+    звук, если его не забирать вовремя — например, пока распознаётся
+    предыдущая фраза. Здесь кадры непрерывно складываются в очередь, а
+    read() отдаёт их по порядку. Очередь ограничена max_buffered_seconds:
+    при переполнении отбрасываются самые старые кадры (их число — в
+    dropped_frames).
+    """
+
+    def __init__(self, source, max_buffered_seconds=30):
+        self.source = source
+        self.sample_rate = source.sample_rate
+        self.frame_samples = source.frame_samples
+        self.dropped_frames = 0
+        self._frames = deque(maxlen=max(1, int(max_buffered_seconds * self.sample_rate / self.frame_samples)))
+        self._cond = threading.Condition()
+        self._finished = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audio-reader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._closed:
+                frame = self.source.read()
+                if frame is None:
+                    break
+                with self._cond:
+                    if len(self._frames) == self._frames.maxlen:
+                        self.dropped_frames += 1
+                    self._frames.append(frame)
+                    self._cond.notify_all()
+        except Exception as e:
+            print(f"Ошибка чтения звука: {e}")
+        finally:
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+
+    def buffered_seconds(self):
+        with self._cond:
+            return len(self._frames) * self.frame_samples / self.sample_rate
+
+    def read(self):
+        """Возвращает следующий кадр или None, когда источник закончился."""
+        with self._cond:
+            while not self._frames and not self._finished:
+                self._cond.wait()
+            return self._frames.popleft() if self._frames else None
+
+    def close(self):
+        self._closed = True
+        # Поток чтения выходит после текущего кадра; закрывать устройство во время чтения нельзя
+        self._thread.join(timeout=2)
+        self.source.close()
+        with self._cond:
+            self._finished = True
+            self._frames.clear()
+            self._cond.notify_all()
+        if self.dropped_frames:
+            print(f"⚠️ Распознавание не успевало: потеряно "
+                  f"{self.dropped_frames * self.frame_samples / self.sample_rate:.1f}с звука")
+
+
+class MicrophoneSource:
+    """Микрофон через speech_recognition/PyAudio, открытый на всё время работы."""
+
+    def __init__(self, device_index=None):
+        import speech_recognition as sr
+        self._microphone = sr.Microphone(device_index=device_index)
+        self._microphone.__enter__()
+        self.sample_rate = self._microphone.SAMPLE_RATE
+        self.frame_samples = self._microphone.CHUNK
+        if self._microphone.SAMPLE_WIDTH != 2:
+            raise ValueError("поддерживается только 16-битный звук")
+
+    def read(self):
+        return self._microphone.stream.read(self.frame_samples)
+
+    def close(self):
+        self._microphone.__exit__(None, None, None)
+
+
+class CaptureEngine:
+    """Разбивает непрерывный звуковой поток на фразы по паузам.
+
+    Порог речи — уровень шума, умноженный на threshold_ratio. Шум
+    замеряется один раз в начале (calibration_ms), а затем каждые
+    recalibrate_every секунд пересчитывается по тихим кадрам. Последние
+    preroll_ms звука хранятся в кольцевом буфере, чтобы не обрезать начало
+    фразы; фраза отдаётся, как только пауза длится pause_ms, но не
+    длиннее max_phrase_seconds.
+    """
+
+    def __init__(self, source, calibration_ms=500, threshold_ratio=3.0, min_threshold=300,
+                 pause_ms=700, preroll_ms=300, min_phrase_ms=300, max_phrase_seconds=15,
+                 recalibrate_every=30):
+        self.source = source
+        self.sample_rate = source.sample_rate
+        self.frame_seconds = source.frame_samples / source.sample_rate
+        self.calibration_frames = max(1, int(calibration_ms / 1000 / self.frame_seconds))
+        self.threshold_ratio = threshold_ratio
+        self.min_threshold = min_threshold
+        self.pause_frames = max(1, int(pause_ms / 1000 / self.frame_seconds))
+        self.min_phrase_frames = max(1, int(min_phrase_ms / 1000 / self.frame_seconds))
+        self.max_phrase_frames = max(1, int(max_phrase_seconds / self.frame_seconds))
+        self.recalibrate_every = recalibrate_every
+        self.noise_level = None
+        self.recalibrations = 0
+        self._preroll = deque(maxlen=max(1, int(preroll_ms / 1000 / self.frame_seconds)))
+        self._quiet_levels = deque(maxlen=max(1, int(5 / self.frame_seconds)))
+        self._last_calibration = 0.0
+        self._frames_read = 0
+        self._finished = False
+
+    def threshold(self):
+        return max(self.min_threshold, self.noise_level * self.threshold_ratio)
+
+    def _read(self):
+        frame = self.source.read()
+        if frame is not None:
+            self._frames_read += 1
+        return frame
+
+    def _stream_time(self):
+        return self._frames_read * self.frame_seconds
+
+    def calibrate(self):
+        """Разовая калибровка шума по первым кадрам потока."""
+        levels = []
+        for _ in range(self.calibration_frames):
+            frame = self._read()
+            if frame is None:
+                break
+            levels.append(rms(frame))
+            self._preroll.append(frame)
+        self.noise_level = sum(levels) / len(levels) if levels else 0.0
+        self._last_calibration = self._stream_time()
+        print(f"🎚️ Уровень шума: {self.noise_level:.0f}, порог речи: {self.threshold():.0f}")
+
+    def _maybe_recalibrate(self, level):
+        self._quiet_levels.append(level)
+        if self._stream_time() - self._last_calibration >= self.recalibrate_every:
+            # Медиана тихих кадров устойчива к случайным щелчкам
+            ordered = sorted(self._quiet_levels)
+            self.noise_level = ordered[len(ordered) // 2]
+            self._last_calibration = self._stream_time()
+            self.recalibrations += 1
+
+    def next_segment(self, listener=None):
+        """Ждёт следующую фразу. Возвращает AudioSegment или None, если поток закончился.
+
+        listener (например, поток распознавания) получает кадры речи сразу
+        по мере записи через accept(frame) и reset(), если фраза оказалась шумом.
+        """
+        if self._finished:
+            return None
+        if self.noise_level is None:
+            self.calibrate()
+
+        speech = []
+        silent_run = 0
+        voiced = 0
+        started_at = None
+        while True:
+            frame = self._read()
+            if frame is None:
+                self._finished = True
+                break
+            level = rms(frame)
+            is_speech = level > self.threshold()
+
+            if not speech:
+                if is_speech:
+                    speech = list(self._preroll) + [frame]
+                    started_at = self._stream_time() - len(speech) * self.frame_seconds
+                    voiced = 1
+                    silent_run = 0
+                    if listener is not None:
+                        for buffered in speech:
+                            listener.accept(buffered)
+                else:
+                    self._preroll.append(frame)
+                    self._maybe_recalibrate(level)
+                continue
+
+            speech.append(frame)
+            if listener is not None:
+                listener.accept(frame)
+            if is_speech:
+                voiced += 1
+                silent_run = 0
+            else:
+                silent_run += 1
+            if silent_run >= self.pause_frames or len(speech) >= self.max_phrase_frames:
+                if voiced >= self.min_phrase_frames:
+                    break
+                # Короткий щелчок — не фраза, продолжаем слушать
+                speech, voiced, silent_run = [], 0, 0
+                self._preroll.clear()
+                if listener is not None:
+                    listener.reset()
+
+        if not speech or voiced < self.min_phrase_frames:
+            if speech and listener is not None:
+                listener.reset()
+            return None
+        self._preroll.clear()
+        return AudioSegment(b"".join(speech), self.sample_rate, started_at,
+                            self._stream_time(), time.monotonic())
+
+    def close(self):
+        self.source.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Использование: python capture.py запись.wav [--fast]")
+        sys.exit(1)
+    source = WavFileSource(sys.argv[1], realtime="--fast" not in sys.argv)
+    engine = CaptureEngine(source)
+    started = time.monotonic()
+    count = 0
+    while True:
+        segment = engine.next_segment()
+        if segment is None:
+            break
+        count += 1
+        # Насколько позже конца фразы (по времени записи) она была отдана
+        lag = segment.detected_at - started - segment.ended_at
+        print(f"🗣️ Фраза {count}: {segment.started_at:.2f}–{segment.ended_at:.2f}с, "
+              f"длительность {segment.duration():.2f}с, задержка выдачи {lag * 1000:.0f} мс")
+    engine.close()
+    elapsed = time.monotonic() - started
+    print(f"📊 Фраз: {count}, обработано за {elapsed:.2f}с, перекалибровок: {engine.recalibrations}")
@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from metrics import tracer
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Endpoint:
+    """Сервер Ollama: сколько запросов в работе, средняя задержка и состояние предохранителя."""
+
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.latency = None  # экспоненциальное среднее, секунды
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.opened_at = None  # время размыкания предохранителя; None — сервер в работе
+
+    def available(self):
+        return self.opened_at is None
+
+    def load_key(self):
+        # Ожидаемое время ответа: запросы в работе плюс новый, умноженные на
+        # среднюю задержку. Сервер без замеров пробуем первым; при равенстве
+        # выбираем тот, где меньше запросов в работе
+        latency = self.latency if self.latency is not None else 0.0
+        return ((self.outstanding + 1) * latency, self.outstanding)
+
+
+class EndpointPool:
+    """Распределение запросов по нескольким серверам Ollama.
+
+    Запрос уходит на доступный сервер с наименьшей ожидаемой задержкой:
+    число запросов в работе, умноженное на среднюю задержку сервера. При ошибке соединения, таймауте или ответе 5xx запрос
+    повторяется на другом сервере. После failure_threshold ошибок подряд
+    сервер исключается (предохранитель размыкается), и фоновый поток
+    раз в probe_interval секунд проверяет его функцией probe(url); после
+    успешной проверки сервер возвращается в работу. Запросы с hedge=True
+    дублируются на второй сервер, если первый не ответил за p95 задержки
+    этого вида запросов (но не раньше min_hedge_delay).
+    """
+
+    def __init__(self, urls, session=None, probe=None, failure_threshold=3,
+                 probe_interval=5.0, initial_hedge_delay=1.0, min_hedge_delay=0.2,
+                 hedge_quantile=0.95):
+        if not urls:
+            raise ValueError("Не задан ни один сервер Ollama")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.session = session or requests.Session()
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self._latencies = {}  # вид запроса → последние задержки
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+        self._prober = None
+        if probe is not None:
+            self._prober = threading.Thread(target=self._probe_loop, name="ollama-probe", daemon=True)
+            self._prober.start()
+
+    def pick(self, exclude=()):
+        """Выбирает наименее загруженный доступный сервер или None."""
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.available() and e not in exclude]
+            if not candidates:
+                return None
+            return min(candidates, key=Endpoint.load_key)
+
+    def hedge_delay(self, kind):
+        """Через сколько секунд дублировать запрос: p95 недавних задержек этого вида."""
+        with self._lock:
+            samples = list(self._latencies.get(kind, ()))
+        if len(samples) < 10:
+            return self.initial_hedge_delay
+        return max(self.min_hedge_delay, _percentile(samples, self.hedge_quantile))
+
+    def post(self, payload, timeout=30, kind="generate", hedge=False, **kwargs):
+        """Отправляет POST на выбранный сервер (с повтором на другом). Возвращает ответ.
+
+        Если все серверы недоступны, выбрасывает requests.exceptions.ConnectionError.
+        """
+        if hedge and len(self.endpoints) > 1:
+            return self._post_hedged(payload, timeout, kind, **kwargs)
+        tried = []
+        last_error = None
+        while True:
+            endpoint = self.pick(exclude=tried)
+            if endpoint is None:
+                if last_error is not None:
+                    raise last_error
+                raise requests.exceptions.ConnectionError("Все серверы Ollama недоступны")
+            if tried:
+                self._count_failover()
+            tried.append(endpoint)
+            try:
+                response = self._send(endpoint, payload, timeout, kind, **kwargs)
+            except requests.exceptions.RequestException as e:
+                last_error = e
+                continue
+            if response.status_code < 500:
+                return response
+            last_error = requests.exceptions.HTTPError(f"код {response.status_code}", response=response)
+            if self.pick(exclude=tried) is None:
+                return response
+
+    def _post_hedged(self, payload, timeout, kind, **kwargs):
+        primary = self.pick()
+        if primary is None:
+            raise requests.exceptions.ConnectionError("Все серверы Ollama недоступны")
+        tried = [primary]
+        futures = {self._executor.submit(self._send, primary, payload, timeout, kind, **kwargs): primary}
+        hedged = False
+        last_error = None
+        last_response = None
+        while futures:
+            delay = None if hedged else self.hedge_delay(kind)
+            done, _ = wait(futures, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                # Основной сервер отвечает дольше обычного — дублируем запрос
+                hedged = True
+                backup = self.pick(exclude=tried)
+                if backup is not None:
+                    tried.append(backup)
+                    futures[self._executor.submit(self._send, backup, payload, timeout, kind, **kwargs)] = backup
+                    with self._lock:
+                        self.hedges += 1
+                    tracer.count("ollama_hedges_total", kind=kind)
+                continue
+            for future in done:
+                endpoint = futures.pop(future)
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    last_error = e
+                else:
+                    if response.status_code < 500:
+                        if endpoint is not primary:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        # Проигравший запрос дорабатывает в фоне, его ответ не нужен
+                        return response
+                    last_response = response
+            if not futures:
+                # Все отправленные запросы провалились — пробуем ещё не задействованный сервер
+                hedged = True
+                backup = self.pick(exclude=tried)
+                if backup is not None:
+                    self._count_failover()
+                    tried.append(backup)
+                    futures[self._executor.submit(self._send, backup, payload, timeout, kind, **kwargs)] = backup
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def _count_failover(self):
+        with self._lock:
+            self.failovers += 1
+        tracer.count("ollama_failovers_total")
+
+    def _send(self, endpoint, payload, timeout, kind, **kwargs):
+        with self._lock:
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        started = time.perf_counter()
+        try:
+            response = self.session.post(endpoint.url, json=payload, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            self._record(endpoint, kind, None)
+            raise
+        self._record(endpoint, kind, time.perf_counter() - started if response.status_code < 500 else None)
+        return response
+
+    def _record(self, endpoint, kind, latency):
+        """Учитывает результат запроса; latency=None — ошибка."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if latency is None:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.available() and endpoint.consecutive_failures >= self.failure_threshold:
+                    endpoint.opened_at = time.monotonic()
+                    print(f"⚠️ Сервер Ollama {endpoint.url} исключён после "
+                          f"{endpoint.consecutive_failures} ошибок подряд")
+                    tracer.count("ollama_circuit_open_total", endpoint=endpoint.url)
+                return
+            endpoint.consecutive_failures = 0
+            endpoint.latency = latency if endpoint.latency is None else 0.8 * endpoint.latency + 0.2 * latency
+            self._latencies.setdefault(kind, deque(maxlen=100)).append(latency)
+
+    def _probe_loop(self):
+        while not self._closed.wait(self.probe_interval):
+            with self._lock:
+                opened = [e for e in self.endpoints if not e.available()]
+            for endpoint in opened:
+                if self.probe(endpoint.url):
+                    with self._lock:
+                        endpoint.opened_at = None
+                        endpoint.consecutive_failures = 0
+                    print(f"🟢 Сервер Ollama {endpoint.url} снова в работе")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "failovers": self.failovers,
+                "endpoints": [{
+                    "url": e.url,
+                    "available": e.available(),
+                    "outstanding": e.outstanding,
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "latency": round(e.latency, 3) if e.latency is not None else None,
+                } for e in self.endpoints],
+            }
+
+    def close(self):
+        self._closed.set()
+        self._executor.shutdown(wait=False)
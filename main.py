@@ -1,31 +1,112 @@
+import time
+_STARTED = time.perf_counter()  # от этой точки считается время запуска
 import os
+import json
 import requests
 import subprocess
-import speech_recognition as sr
-from pptx import Presentation
-from pptx.dml.color import RGBColor
+# speech_recognition и pptx импортируются там, где нужны: так программа
+# начинает слушать раньше, а в режиме частей не разбирает старую презентацию
+import queue
 import re
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from cache import open_cache
+from pipeline import SlidePipeline
+from persistence import DeckSaver, PartedDeck, SlideJournal
+from router import KeywordRouter
+from theme import apply_deck_theme, contrast_text_color, deck_theme_applied, read_deck_theme, read_file_theme
+from metrics import peak_rss_mb, tracer
+from capture import BufferedSource, CaptureEngine, MicrophoneSource, WavFileSource
+from asr import create_backend
+from preview import PreviewServer, render_slide_html
+from endpoints import EndpointPool
+from prompt_reuse import PromptReuse
 
 # Настройки
 PPTX_FILE = "auto_presentation.pptx"
 OLLAMA_URL = "http://localhost:11434/api/generate"
+# Несколько серверов Ollama: запрос уходит на наименее загруженный; None — только OLLAMA_URL
+OLLAMA_URLS = None
+OLLAMA_TIMEOUT = 30  # секунд на один запрос
+HEDGE_KINDS = ("title",)  # какие запросы дублировать на второй сервер, если первый медлит
+CIRCUIT_FAILURES = 3  # после стольких ошибок подряд сервер исключается до успешной проверки
+CIRCUIT_PROBE_SECONDS = 5  # как часто проверять исключённые серверы
+KEEP_ALIVE = "30m"  # сколько Ollama держит модель в памяти после запроса
+WARM_UP_ENABLED = True  # загрузить модель и вычислить инструкции при запуске
 MODEL_NAME = "llama3.2" # Правильное имя модели
+# Один запрос с JSON-ответом вместо трёх текстовых (при ошибке — обычный путь)
+STRUCTURED_GENERATION = False
+# Потоковый режим: слайд заполняется по мере генерации токенов
+STREAMING_GENERATION = False
+# Кэш ответов модели (память + диск), переживает перезапуски
+CACHE_ENABLED = True
+CACHE_FILE = ".slide_cache.sqlite3"
+CACHE_MEMORY_ENTRIES = 256
+CACHE_DISK_ENTRIES = 5000
+CACHE_TTL = 7 * 24 * 3600  # секунд
+# Конвейер «захват → генерация → запись»
+PIPELINE_WORKERS = 2  # потоков генерации
+PIPELINE_QUEUE_SIZE = 4  # фраз в очереди
+PIPELINE_OVERFLOW = "merge"  # "block", "merge" или "drop_oldest"
+PIPELINE_STALE_SECONDS = 60  # старые фразы склеиваются со следующими
+# Фоновое сохранение: запросы объединяются, запись атомарная
+SAVE_DEBOUNCE_SECONDS = 1.0
+SAVE_MAX_DELAY_SECONDS = 5.0
+JOURNAL_FILE = PPTX_FILE + ".journal"  # несохранённые слайды для восстановления
+# Режим частей для долгих сессий: существующая презентация не открывается при
+# запуске, новые слайды пишутся в небольшие файлы-части, которые в конце
+# объединяются с основным файлом
+DECK_PARTS_ENABLED = False
+DECK_PART_MAX_SLIDES = 50  # слайдов в одной части
+DECK_PART_MAX_MB = 10  # размер файла части, после которого начинается новая
+# Готовые слайды из config.json по ключевым фразам (без обращения к модели)
+CONFIG_FILE = "config.json"
+KEYWORD_ROUTER_ENABLED = True
+KEYWORD_ROUTER_MIN_MATCHES = 2  # сколько ключевых фраз раздела должно совпасть
+KEYWORD_ROUTER_MIN_COVERAGE = 0.5  # или какую долю слов фразы они должны покрыть
+# Дизайн запрашивается один раз и записывается в тему презентации;
+# слайды наследуют его без собственного оформления
+DECK_THEME_ENABLED = True
+# Трассировка этапов: JSONL-файл трасс и эндпоинт /metrics для Prometheus
+TRACING_ENABLED = False
+TRACE_FILE = "slide_trace.jsonl"
+METRICS_PORT = 9464  # None — не поднимать эндпоинт
+# Непрерывный захват: устройство открывается один раз, фразы режутся по паузам
+CAPTURE_ENGINE_ENABLED = True
+AUDIO_INPUT_FILE = None  # путь к WAV вместо микрофона (для серверов без звука)
+PAUSE_MS = 700  # пауза, после которой фраза считается законченной
+RECALIBRATE_SECONDS = 30  # как часто пересчитывать уровень шума
+# Движок распознавания: "google" (облако) или "vosk" (локально, без сети)
+ASR_BACKEND = "google"
+VOSK_MODEL_PATH = "models/vosk-model-small-ru-0.22"
+
+PREVIEW_ENABLED = True  # живой предпросмотр в браузере
+PREVIEW_PORT = 8765
+POWERPOINT_REFRESH = False  # перезапуск PowerPoint через AppleScript после сохранения (только macOS)
 
 def recognize_speech():
     """Распознаёт речь через микрофон, возвращает текст или пустую строку."""
+    import speech_recognition as sr
     r = sr.Recognizer()
     with sr.Microphone() as source:
         print("\n🎤 Говорите... (скажите 'стоп' для выхода)")
         try:
-            r.adjust_for_ambient_noise(source, duration=0.5)
-            audio = r.listen(source, phrase_time_limit=15)
+            with tracer.span("mic_wait"):
+                r.adjust_for_ambient_noise(source, duration=0.5)
+                audio = r.listen(source, phrase_time_limit=15)
         except Exception as e:
             print(f"Ошибка записи: {e}")
             return ""
             
+    return transcribe(r, audio)
+
+def transcribe(recognizer, audio):
+    """Распознаёт записанный фрагмент, возвращает текст или пустую строку."""
+    import speech_recognition as sr
     try:
-        text = r.recognize_google(audio, language="ru-RU")
+        with tracer.span("asr"):
+            text = recognizer.recognize_google(audio, language="ru-RU")
         print(f"\n🔊 Распознано: {text}")
         return text
     except sr.UnknownValueError:
@@ -35,38 +116,495 @@ def recognize_speech():
         print(f"Ошибка распознавания: {e}")
         return ""
 
-def generate_slide_data(text):
-    """Генерирует заголовок, контент и дизайн для слайда."""
-    title_response = ""
+def open_capture_engine():
+    """Открывает источник звука (микрофон или WAV-файл) один раз на всю сессию."""
+    if AUDIO_INPUT_FILE:
+        source = WavFileSource(AUDIO_INPUT_FILE)
+        print(f"🎧 Звук из файла: {AUDIO_INPUT_FILE}")
+    else:
+        source = MicrophoneSource()
+    # Устройство читается непрерывно в своём потоке, пока распознаётся предыдущая фраза
+    return CaptureEngine(BufferedSource(source), pause_ms=PAUSE_MS, recalibrate_every=RECALIBRATE_SECONDS)
+
+def open_capture():
+    """Готовит захват речи для конвейера. Возвращает (движок захвата или None, функция захвата).
+
+    Движок распознавания создаётся до открытия звука: если он не загрузился
+    (например, нет vosk или модели), ошибка прерывает запуск, а не
+    переключает распознавание на Google. Если не удалось открыть поток
+    звука, с движком Google слушаем по одной фразе через recognize_speech;
+    другой движок без потока звука работать не может — это тоже ошибка.
+    """
+    if not CAPTURE_ENGINE_ENABLED:
+        return None, recognize_speech
+    backend = create_backend(ASR_BACKEND, VOSK_MODEL_PATH)
+    engine = None
+    try:
+        engine = open_capture_engine()
+        engine.calibrate()
+    except Exception as e:
+        if engine is not None:
+            engine.close()
+        if backend.name != "google":
+            raise RuntimeError(f"Не удалось открыть поток звука для {backend.name}: {e}") from e
+        print(f"Не удалось открыть поток звука ({e}), слушаем по одной фразе")
+        return None, recognize_speech
+    return engine, make_engine_capture(engine, backend)
+
+class _PartialPrinter:
+    """Передаёт кадры речи в поток распознавания и печатает промежуточные гипотезы."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def accept(self, frame):
+        partial = self.stream.accept(frame)
+        if partial:
+            print(f"\r💬 {partial}", end="", flush=True)
+
+    def reset(self):
+        self.stream.reset()
+
+def make_engine_capture(engine, backend):
+    """Функция захвата для конвейера: следующая фраза из потока → текст.
+
+    Звук подаётся движку распознавания по мере записи, так что потоковый
+    движок к концу фразы уже почти всё распознал. Возвращает None, когда
+    звуковой поток закончился (конец WAV-файла).
+    """
+    def capture():
+        print("\n🎤 Говорите... (скажите 'стоп' для выхода)")
+        stream = backend.open_stream(engine.sample_rate)
+        with tracer.span("mic_wait"):
+            segment = engine.next_segment(_PartialPrinter(stream) if backend.streaming else stream)
+        if segment is None:
+            return None
+        try:
+            with tracer.span("asr", backend=backend.name):
+                text = stream.finish()
+        except Exception as e:
+            print(f"Ошибка распознавания: {e}")
+            return ""
+        if text:
+            print(f"\n🔊 Распознано: {text}")
+        else:
+            print("\nРечь не распознана")
+        return text
+    return capture
+
+class OllamaClient:
+    """Соединения с Ollama: keep-alive сессия, пул серверов и потоки для параллельных запросов.
+
+    Функции генерации принимают client; без него используется клиент по
+    умолчанию из настроек этого файла (get_client()). Сервис и пакетная
+    сборка создают собственный клиент под свою нагрузку. workers — сколько
+    запросов (контент и дизайн слайдов) может выполняться параллельно.
+    """
+
+    def __init__(self, urls, workers=8):
+        self.session = requests.Session()
+        self.session.mount("http://", requests.adapters.HTTPAdapter(
+            pool_connections=max(4, len(urls)), pool_maxsize=workers))
+        self.endpoints = EndpointPool(
+            urls, session=self.session, probe=lambda url: check_ollama(url, verbose=False),
+            failure_threshold=CIRCUIT_FAILURES, probe_interval=CIRCUIT_PROBE_SECONDS)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ollama")
+        self.prompt_reuse = {}  # вид запроса → PromptReuse
+        self._lock = threading.Lock()
+
+    def reuse(self, kind):
+        """Статистика повторного использования префикса промптов вида kind."""
+        with self._lock:
+            if kind not in self.prompt_reuse:
+                self.prompt_reuse[kind] = PromptReuse(kind)
+            return self.prompt_reuse[kind]
+
+    def record_prompt_eval(self, kind, prompt, data):
+        """Учитывает, сколько промпта Ollama взяла из кэша, и печатает экономию."""
+        reused, saved = self.reuse(kind).record(prompt, data)
+        if reused:
+            print(f"♻️ {kind}: ~{reused} токенов инструкций из кэша Ollama, "
+                  f"оценка промпта быстрее на {saved:.2f}с")
+
+    def close(self):
+        self.endpoints.close()
+        self.pool.shutdown(wait=False)
+
+_cache = None
+_cache_lock = threading.Lock()
+_client = None
+
+def get_client():
+    """Возвращает клиент Ollama по умолчанию (создаётся при первом обращении)."""
+    global _client
+    with _cache_lock:
+        if _client is None:
+            _client = OllamaClient(OLLAMA_URLS or [OLLAMA_URL])
+        return _client
+
+def get_endpoints():
+    """Возвращает пул серверов Ollama клиента по умолчанию."""
+    return get_client().endpoints
+
+def get_cache():
+    """Возвращает общий кэш ответов (открывается при первом обращении) или None."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = open_cache(CACHE_FILE, max_memory_entries=CACHE_MEMORY_ENTRIES,
+                                max_disk_entries=CACHE_DISK_ENTRIES, ttl=CACHE_TTL)
+        return _cache
+
+class _CachedResponse:
+    """Ответ Ollama, восстановленный из кэша (интерфейс как у requests.Response)."""
+
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+        self.text = json.dumps(data, ensure_ascii=False)
+
+    def json(self):
+        return self._data
+
+def _record_ollama_usage(kind, data, attrs):
+    """Переносит счётчики токенов из ответа Ollama в метрики и атрибуты замера."""
+    for field, token_type in (("prompt_eval_count", "prompt"), ("eval_count", "eval")):
+        if field in data:
+            attrs[field] = data[field]
+            tracer.count("ollama_tokens_total", data[field], kind=kind, type=token_type)
+    for field in ("prompt_eval_duration", "eval_duration"):
+        if field in data:
+            attrs[field] = data[field] / 1e9  # наносекунды → секунды
+
+def ollama_generate(prompt, temperature, response_format=None, url=None, kind="generate",
+                    client=None, use_cache=True):
+    """Отправляет запрос к Ollama через сессию клиента, возвращает объект ответа.
+
+    url позволяет обратиться к конкретному серверу Ollama; по умолчанию запрос
+    уходит на наименее загруженный из пула (OLLAMA_URLS или OLLAMA_URL) с
+    повтором на другом сервере при сбое. kind — название запроса для метрик
+    (title, content, design, ...); запросы из HEDGE_KINDS дублируются.
+    Успешные ответы кэшируются по модели, промпту и параметрам запроса;
+    use_cache=False отправляет запрос модели в любом случае (прогрев).
+    """
+    payload = {
+        "model": MODEL_NAME,
+        "prompt": prompt,
+        "stream": False,
+        "keep_alive": KEEP_ALIVE,
+        "options": {"temperature": temperature}
+    }
+    if response_format is not None:
+        payload["format"] = response_format
+
+    with tracer.span(f"ollama_{kind}") as attrs:
+        cache = get_cache() if use_cache else None
+        if cache is not None:
+            key = cache.make_key("generate", payload)
+            cached = cache.get(key)
+            if cached is not None:
+                if attrs is not None:
+                    attrs["cached"] = True
+                return _CachedResponse(cached)
+
+        client = client or get_client()
+        if url is not None:
+            response = client.session.post(url, json=payload, timeout=OLLAMA_TIMEOUT)
+        else:
+            response = client.endpoints.post(payload, timeout=OLLAMA_TIMEOUT, kind=kind,
+                                             hedge=kind in HEDGE_KINDS)
+        if response.status_code == 200:
+            try:
+                data = response.json()
+            except ValueError:
+                data = None
+            if data is not None:
+                if cache is not None:
+                    cache.put(key, data)
+                client.record_prompt_eval(kind, prompt, data)
+                if attrs is not None:
+                    _record_ollama_usage(kind, data, attrs)
+        elif attrs is not None:
+            attrs["status"] = response.status_code
+        return response
+
+class Placeholder(str):
+    """Текст-заглушка вместо ответа модели (ошибка запроса или неразобранный ответ).
+
+    Ведёт себя как обычная строка, но по типу видно, что слайд стоит
+    сгенерировать заново (см. is_placeholder_slide).
+    """
+
+DESIGN_PLACEHOLDER = Placeholder("Стандартный дизайн")
+
+def is_placeholder_slide(title, content, design_suggestions=None):
+    """True, если заголовок, пункт или дизайн слайда — заглушка, а не ответ модели."""
+    return any(isinstance(value, Placeholder) for value in (title, *content, design_suggestions))
+
+def _timed(stage, timings, func, *args):
+    """Выполняет этап генерации и записывает его время в timings."""
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[stage] = time.perf_counter() - started
+
+# Промпты начинаются с неизменных инструкций, а текст докладчика и тема
+# идут в конце: совпадающее начало Ollama берёт из кэша и не вычисляет заново
+
+def build_title_prompt(text):
+    return f"""<|begin_of_text|><|start_header_id|>user<|end_header_id|>
+Выдели основную тему из текста докладчика (3-5 слов). Ответ дай только самой темой без пояснений.
+Текст: "{text}"<|eot_id|><|start_header_id|>assistant<|end_header_id|>"""
+
+def build_content_prompt(title_response, text):
+    return f"""<|begin_of_text|><|start_header_id|>user<|end_header_id|>
+Сгенерируй 3 ключевых пункта для слайда по теме и тексту докладчика ниже.
+Формат: маркированный список, начни каждый пункт с "-" или "*". Отвечай на русском языке.
+Тема: "{title_response}"
+Текст: "{text}"<|eot_id|><|start_header_id|>assistant<|end_header_id|>"""
+
+def build_design_prompt(title_response):
+    return f"""<|begin_of_text|><|start_header_id|>user<|end_header_id|>
+Создай элегантный, профессиональный дизайн для слайда PowerPoint на тему, указанную в конце.
+
+ВАЖНЫЕ ТРЕБОВАНИЯ К ДИЗАЙНУ:
+1. ШРИФТЫ: Используй ТОЛЬКО мягкие, современные шрифты. Обязательно выбери один из: Montserrat (предпочтительно), Raleway, Open Sans Light, Roboto Light для заголовка. Для основного текста подойдет Open Sans или Lato.
+
+2. ЦВЕТА: Используй ТОЛЬКО спокойные, пастельные тона. Предпочтительно:
+   - Основной цвет: молочный, белый, светло-серый, очень светлый бежевый (#F5F5F5, #FFFFF0, #FAFAFA)
+   - Акцентный цвет: приглушенный, неяркий оттенок (пыльно-розовый, светло-голубой, нежно-зеленый)
+   - НИКАКИХ ярких и контрастных сочетаний, которые напрягают глаза!
+
+3. ФОН: Минималистичный, без лишних элементов. Предпочтительно однотонный светлый.
+
+Опиши дизайн строго в формате:
+1. Цветовая палитра: основной #HEX (светлый/молочный), акцентный #HEX (приглушенный, мягкий)
+2. Шрифты: заголовок Montserrat Light/Raleway (или подобный мягкий шрифт), текст Open Sans/Lato
+3. Фон: краткое описание (минималистичный, однотонный)
+
+Дай ответ только в этом формате на русском языке.
+Тема слайда: "{title_response}"<|eot_id|><|start_header_id|>assistant<|end_header_id|>"""
+
+# Фраза, на которой при запуске вычисляются инструкции всех видов запросов
+WARM_UP_TEXT = "Добрый день! Сегодня я расскажу о том, как устроены нейронные сети."
+WARM_UP_TITLE = "Введение"
+
+def warm_up_model(client=None):
+    """Загружает модель на всех серверах Ollama и заранее вычисляет инструкции.
+
+    Выполняется в фоне при запуске, пока калибруется микрофон. Промпты
+    прогрева строятся из неизменной фразы WARM_UP_TEXT и идут мимо кэша
+    ответов, чтобы модель действительно вычислила инструкции: их начало
+    совпадает с промптами настоящих слайдов, и Ollama берёт его из своего
+    кэша. Первый слайд не ждёт ни загрузки модели, ни оценки длинных инструкций.
+    """
+    client = client or get_client()
+    started = time.perf_counter()
+    payload = {"model": MODEL_NAME, "keep_alive": KEEP_ALIVE}
+
+    def load(url):
+        # Запрос без промпта только загружает модель в память
+        try:
+            response = client.session.post(url, json=payload, timeout=300)
+            return response.status_code == 200
+        except requests.exceptions.RequestException as e:
+            print(f"Не удалось загрузить модель на {url}: {e}")
+            return False
+
+    urls = [endpoint.url for endpoint in client.endpoints.endpoints]
+    loaded = sum(client.pool.map(load, urls))
+    print(f"🔥 Модель {MODEL_NAME} загружена на {loaded} из {len(urls)} серверов "
+          f"за {time.perf_counter() - started:.1f}с")
+
+    primes = [
+        ("title", build_title_prompt(WARM_UP_TEXT), 0.3),
+        ("content", build_content_prompt(WARM_UP_TITLE, WARM_UP_TEXT), 0.5),
+        ("design", build_design_prompt(WARM_UP_TITLE), 0.6),
+    ]
+    futures = [client.pool.submit(ollama_generate, prompt, temperature, None, None, kind, client, False)
+               for kind, prompt, temperature in primes]
+    primed = 0
+    for future in futures:
+        try:
+            primed += future.result().status_code == 200
+        except requests.exceptions.RequestException as e:
+            print(f"Не удалось вычислить инструкции: {e}")
+    print(f"🔥 Инструкции вычислены для {primed} из {len(primes)} видов запросов, "
+          f"прогрев {time.perf_counter() - started:.1f}с")
+
+def parse_content_lines(content_text):
+    """Разбирает маркированный список из ответа модели в список пунктов."""
     content_lines = []
-    design_suggestions = "Стандартный дизайн"
+    for line in content_text.split("\n"):
+        # Убираем маркеры списка и начальные пробелы
+        clean_line = re.sub(r'^[\s*•\-–—]+\s*', '', line).strip()
+        if clean_line:  # Добавляем только непустые строки
+            content_lines.append(clean_line)
+    return content_lines
+
+def fetch_content(title_response, text, url=None, client=None):
+    """Этап 2: генерирует пункты слайда (зависит от заголовка и текста)."""
+    print("Запрашиваю контент...")
+    response = ollama_generate(build_content_prompt(title_response, text), 0.5, url=url, kind="content",
+                               client=client)
+
+    # Проверяем статус ответа
+    if response.status_code != 200:
+        print(f"Ошибка API для контента (код {response.status_code})")
+        return [Placeholder(f"Пункт о {title_response}") for _ in range(3)]
+
+    with tracer.span("parse_content"):
+        content_lines = parse_content_lines(response.json().get("response", ""))
+
+    # Если не смогли распарсить контент, создаем шаблонные пункты
+    if not content_lines:
+        print("Не удалось распарсить контент из ответа API")
+        content_lines = [Placeholder(f"Ключевой аспект {i+1} темы '{title_response}'") for i in range(3)]
+    return content_lines
+
+def fetch_design(title_response, url=None, client=None):
+    """Этап 3: генерирует предложения по дизайну (зависит только от заголовка)."""
+    print("Запрашиваю дизайн...")
+    response = ollama_generate(build_design_prompt(title_response), 0.6, url=url, kind="design",
+                               client=client)
+
+    if response.status_code == 200:
+        return response.json().get("response", "Стандартный дизайн").strip()
+    print(f"Ошибка API для дизайна (код {response.status_code})")
+    return DESIGN_PLACEHOLDER
+
+# JSON-схема ответа для структурного режима (поле format в Ollama)
+SLIDE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "bullets": {"type": "array", "items": {"type": "string"}},
+        "palette": {
+            "type": "object",
+            "properties": {"main": {"type": "string"}, "accent": {"type": "string"}},
+            "required": ["main", "accent"]
+        },
+        "fonts": {
+            "type": "object",
+            "properties": {"title": {"type": "string"}, "text": {"type": "string"}},
+            "required": ["title", "text"]
+        },
+        "background": {"type": "string"}
+    },
+    "required": ["title", "bullets", "palette", "fonts", "background"]
+}
+
+def build_structured_prompt(text):
+    return f"""<|begin_of_text|><|start_header_id|>user<|end_header_id|>
+По тексту докладчика подготовь слайд PowerPoint:
+"{text}"
+
+Верни JSON-объект с полями:
+- title: основная тема текста (3-5 слов);
+- bullets: 3 ключевых пункта на русском языке;
+- palette: main — светлый спокойный цвет фона #HEX (молочный, белый, светло-серый), accent — приглушённый мягкий акцентный цвет #HEX;
+- fonts: title — мягкий современный шрифт заголовка (Montserrat, Raleway, Open Sans Light, Roboto Light), text — шрифт основного текста (Open Sans или Lato);
+- background: краткое описание фона (минималистичный, однотонный).
+НИКАКИХ ярких и контрастных сочетаний.<|eot_id|><|start_header_id|>assistant<|end_header_id|>"""
+
+def validate_structured_slide(data):
+    """Проверяет JSON-ответ модели и приводит его к (заголовок, пункты, дизайн).
+
+    Дизайн возвращается в том же виде, что и parse_design_suggestions.
+    При некорректной структуре выбрасывает ValueError.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("ответ не является JSON-объектом")
+
+    title = data.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("пустой или некорректный заголовок")
+
+    bullets = data.get("bullets")
+    if not isinstance(bullets, list):
+        raise ValueError("поле bullets не является списком")
+    content_lines = [str(item).strip() for item in bullets if str(item).strip()]
+    if not content_lines:
+        raise ValueError("пустой список пунктов")
+
+    palette = data.get("palette") if isinstance(data.get("palette"), dict) else {}
+    fonts = data.get("fonts") if isinstance(data.get("fonts"), dict) else {}
+    for field, value in [("palette.main", palette.get("main")), ("palette.accent", palette.get("accent")),
+                         ("fonts.title", fonts.get("title")), ("fonts.text", fonts.get("text")),
+                         ("background", data.get("background"))]:
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"поле {field} не является строкой")
+    design = {
+        'main_color': parse_hex_color(palette.get("main")),
+        'accent_color': parse_hex_color(palette.get("accent")),
+        'title_font': (fonts.get("title") or "").strip() or None,
+        'text_font': (fonts.get("text") or "").strip() or None,
+        'background_idea': (data.get("background") or "").strip() or None
+    }
+    return title.strip().replace('"', ''), content_lines, apply_design_defaults(design)
+
+def generate_slide_data_structured(text, timings, url=None, client=None):
+    """Получает заголовок, пункты и дизайн одним запросом с JSON-ответом.
+
+    Возвращает None, если ответ не удалось получить или проверить.
+    """
+    print("Запрашиваю слайд одним JSON-запросом...")
+    try:
+        response = _timed("structured", timings, ollama_generate,
+                          build_structured_prompt(text), 0.4, SLIDE_SCHEMA, url, "structured", client)
+        if response.status_code != 200:
+            print(f"Ошибка API для JSON-запроса (код {response.status_code})")
+            return None
+        data = json.loads(response.json().get("response", ""))
+        return validate_structured_slide(data)
+    except (ValueError, requests.exceptions.RequestException) as e:
+        print(f"⚠️ Структурный ответ не получен ({e}), переходим к трём запросам")
+        return None
+
+def generate_slide_data(text, timings=None, url=None, with_design=True, client=None):
+    """Генерирует заголовок, контент и дизайн для слайда.
+
+    В структурном режиме (STRUCTURED_GENERATION) всё запрашивается одним
+    JSON-запросом, а дизайн возвращается готовым словарём. Иначе сначала
+    запрашивается заголовок, затем контент и дизайн выполняются
+    параллельно. Если передан словарь timings, в него записывается время
+    каждого этапа в секундах. url задаёт сервер Ollama (по умолчанию —
+    наименее загруженный из пула клиента), client — клиент Ollama (по
+    умолчанию get_client()).
+    При with_design=False дизайн не запрашивается и возвращается None —
+    слайд наследует оформление темы презентации.
+    """
+    title_response = ""
+    design_suggestions = DESIGN_PLACEHOLDER if with_design else None
+    if timings is None:
+        timings = {}
+    client = client or get_client()
     
     if not text:
         print("Получен пустой текст для генерации")
         return "", [], design_suggestions
     
+    started = time.perf_counter()
     try:
+        if STRUCTURED_GENERATION:
+            structured = generate_slide_data_structured(text, timings, url, client)
+            if structured is not None:
+                title_response, content_lines, design = structured
+                return title_response, content_lines, design if with_design else None
+
         # --- 1. Генерация заголовка ---
-        title_prompt = f"""<|begin_of_text|><|start_header_id|>user<|end_header_id|>
-Выдели основную тему из текста (3-5 слов):
-"{text}". Ответ дай только самой темой без пояснений.<|eot_id|><|start_header_id|>assistant<|end_header_id|>"""
-        
         print("Запрашиваю заголовок...")
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": MODEL_NAME,
-                "prompt": title_prompt,
-                "stream": False,
-                "options": {"temperature": 0.3}
-            },
-            timeout=30
-        )
+        response = _timed("title", timings, ollama_generate, build_title_prompt(text), 0.3,
+                          None, url, "title", client)
         
         # Проверяем статус ответа
         if response.status_code != 200:
             print(f"Ошибка API (код {response.status_code}): {response.text}")
-            return "Ошибка API", ["Не удалось получить ответ от API"], design_suggestions
+            return Placeholder("Ошибка API"), [Placeholder("Не удалось получить ответ от API")], design_suggestions
             
         title_data = response.json()
         title_response = title_data.get("response", "").strip().replace('"', '')
@@ -77,98 +615,35 @@ def generate_slide_data(text):
         
         print(f"Заголовок: {title_response}")
         
-        # --- 2. Генерация контента ---
-        content_prompt = f"""<|begin_of_text|><|start_header_id|>user<|end_header_id|>
-Сгенерируй 3 ключевых пункта для слайда на тему "{title_response}"
-на основе текста: "{text}". Формат: маркированный список, начни каждый пункт с "-" или "*".
-Отвечай на русском языке.<|eot_id|><|start_header_id|>assistant<|end_header_id|>"""
-        
-        print("Запрашиваю контент...")
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": MODEL_NAME,
-                "prompt": content_prompt,
-                "stream": False,
-                "options": {"temperature": 0.5}
-            },
-            timeout=30
-        )
-        
-        # Проверяем статус ответа
-        if response.status_code != 200:
-            print(f"Ошибка API для контента (код {response.status_code})")
-            content_lines = [f"Пункт о {title_response}" for _ in range(3)]
-        else:
-            content_text = response.json().get("response", "")
-            
-            # Улучшенный парсинг контента с поддержкой разных маркеров
-            raw_lines = content_text.split("\n")
-            content_lines = []
-            
-            for line in raw_lines:
-                # Убираем маркеры списка и начальные пробелы
-                clean_line = re.sub(r'^[\s*•\-–—]+\s*', '', line).strip()
-                if clean_line:  # Добавляем только непустые строки
-                    content_lines.append(clean_line)
-            
-            # Если не смогли распарсить контент, создаем шаблонные пункты
-            if not content_lines:
-                print("Не удалось распарсить контент из ответа API")
-                content_lines = [f"Ключевой аспект {i+1} темы '{title_response}'" for i in range(3)]
-        
-        # --- 3. Генерация дизайна ---
-        design_prompt = f"""<|begin_of_text|><|start_header_id|>user<|end_header_id|>
-Создай элегантный, профессиональный дизайн для слайда PowerPoint на тему "{title_response}".
-
-ВАЖНЫЕ ТРЕБОВАНИЯ К ДИЗАЙНУ:
-1. ШРИФТЫ: Используй ТОЛЬКО мягкие, современные шрифты. Обязательно выбери один из: Montserrat (предпочтительно), Raleway, Open Sans Light, Roboto Light для заголовка. Для основного текста подойдет Open Sans или Lato.
-
-2. ЦВЕТА: Используй ТОЛЬКО спокойные, пастельные тона. Предпочтительно:
-   - Основной цвет: молочный, белый, светло-серый, очень светлый бежевый (#F5F5F5, #FFFFF0, #FAFAFA)
-   - Акцентный цвет: приглушенный, неяркий оттенок (пыльно-розовый, светло-голубой, нежно-зеленый)
-   - НИКАКИХ ярких и контрастных сочетаний, которые напрягают глаза!
-
-3. ФОН: Минималистичный, без лишних элементов. Предпочтительно однотонный светлый.
-
-Опиши дизайн строго в формате:
-1. Цветовая палитра: основной #HEX (светлый/молочный), акцентный #HEX (приглушенный, мягкий)
-2. Шрифты: заголовок Montserrat Light/Raleway (или подобный мягкий шрифт), текст Open Sans/Lato
-3. Фон: краткое описание (минималистичный, однотонный)
-
-Дай ответ только в этом формате на русском языке.<|eot_id|><|start_header_id|>assistant<|end_header_id|>"""
-        
-        print("Запрашиваю дизайн...")
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": MODEL_NAME,
-                "prompt": design_prompt,
-                "stream": False,
-                "options": {"temperature": 0.6}
-            },
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            design_suggestions = response.json().get("response", "Стандартный дизайн").strip()
-        else:
-            print(f"Ошибка API для дизайна (код {response.status_code})")
+        # --- 2 и 3. Контент и дизайн параллельно ---
+        content_future = client.pool.submit(tracer.bind(_timed), "content", timings, fetch_content,
+                                            title_response, text, url, client)
+        if with_design:
+            design_future = client.pool.submit(tracer.bind(_timed), "design", timings, fetch_design,
+                                               title_response, url, client)
+        content_lines = content_future.result()
+        if with_design:
+            design_suggestions = design_future.result()
         
         return title_response, content_lines, design_suggestions
         
     except requests.exceptions.Timeout:
         print("Превышено время ожидания ответа от API")
-        return "Таймаут API", ["Сервер не ответил вовремя"], "Стандартный дизайн"
+        return Placeholder("Таймаут API"), [Placeholder("Сервер не ответил вовремя")], design_suggestions
     except requests.exceptions.ConnectionError:
-        print(f"Не удалось подключиться к {OLLAMA_URL}")
-        return "Ошибка соединения", ["Проверьте работу Ollama"], "Стандартный дизайн"
+        print(f"Не удалось подключиться к {url or 'серверам Ollama'}")
+        return Placeholder("Ошибка соединения"), [Placeholder("Проверьте работу Ollama")], design_suggestions
     except Exception as e:
         print(f"Неожиданная ошибка при генерации: {e}")
-        return "Ошибка", ["Технические проблемы при генерации"], "Стандартный дизайн"
+        return Placeholder("Ошибка"), [Placeholder("Технические проблемы при генерации")], design_suggestions
+    finally:
+        timings["total"] = time.perf_counter() - started
+        stages = ", ".join(f"{name} {seconds:.2f}с" for name, seconds in timings.items())
+        print(f"⏱️ Время этапов генерации: {stages}")
 
 def parse_hex_color(text):
     """Извлекает HEX-код цвета из текста."""
+    from pptx.dml.color import RGBColor
     if not text: return None
     match = re.search(r'#([A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})\b', str(text))
     if match:
@@ -185,7 +660,33 @@ def parse_hex_color(text):
     return None
 
 def parse_design_suggestions(suggestions_text):
-    """Парсит текстовые предложения по дизайну."""
+    """Парсит текстовые предложения по дизайну (результат кэшируется по тексту)."""
+    with tracer.span("parse_design"):
+        return _parse_design_cached(suggestions_text)
+
+def _parse_design_cached(suggestions_text):
+    from pptx.dml.color import RGBColor
+    cache = get_cache()
+    if cache is None:
+        return _parse_design_text(suggestions_text)
+
+    key = cache.make_key("design", suggestions_text)
+    cached = cache.get(key)
+    if cached is not None:
+        design = dict(cached)
+        for color_key in ('main_color', 'accent_color'):
+            design[color_key] = RGBColor.from_string(cached[color_key])
+        return design
+
+    design = _parse_design_text(suggestions_text)
+    serialized = dict(design)
+    for color_key in ('main_color', 'accent_color'):
+        serialized[color_key] = str(design[color_key])
+    cache.put(key, serialized)
+    return design
+
+def _parse_design_text(suggestions_text):
+    from pptx.dml.color import RGBColor
     design = {
         'main_color': None, 
         'accent_color': None,
@@ -242,15 +743,16 @@ def parse_design_suggestions(suggestions_text):
     if bg_match:
         design['background_idea'] = bg_match.group(1).strip()
     
-    # Значения по умолчанию
-    if design['main_color'] is None: design['main_color'] = RGBColor(240, 240, 240)  # Светло-серый
-    if design['accent_color'] is None: design['accent_color'] = RGBColor(0, 0, 0)  # Черный
-    
+    return apply_design_defaults(design)
+
+def apply_design_defaults(design):
+    """Подставляет цвета по умолчанию и проверяет контрастность акцентного цвета."""
+    from pptx.dml.color import RGBColor
     # Значения по умолчанию
     if design['main_color'] is None: design['main_color'] = RGBColor(240, 240, 240)  # Светло-серый
     if design['accent_color'] is None: design['accent_color'] = RGBColor(0, 0, 0)  # Черный
 
-    # НОВЫЙ КОД: Проверка контрастности акцентного цвета
+    # Проверка контрастности акцентного цвета
     main_brightness = sum([design['main_color'][0], design['main_color'][1], design['main_color'][2]]) / 3
     if main_brightness > 180:  # Если фон очень светлый
         accent_brightness = sum([design['accent_color'][0], design['accent_color'][1], design['accent_color'][2]]) / 3
@@ -261,22 +763,60 @@ def parse_design_suggestions(suggestions_text):
     print(f"ℹ️ Распарсенный дизайн: {design}")
     return design
 
-def create_slide(presentation, title, content, design_suggestions):
-    """Создаёт слайд и применяет базовый дизайн."""
+def add_slide(presentation):
+    """Добавляет слайд с макетом «Заголовок и контент», возвращает слайд или None."""
     try:
-        # Создаем слайд
         slide_layout = presentation.slide_layouts[1]  # Макет "Заголовок и контент"
-        slide = presentation.slides.add_slide(slide_layout)
+        return presentation.slides.add_slide(slide_layout)
     except IndexError:
         try:
             slide_layout = presentation.slide_layouts[0]  # Пробуем первый макет
-            slide = presentation.slides.add_slide(slide_layout)
+            return presentation.slides.add_slide(slide_layout)
         except Exception as e:
             print(f"Не удалось создать слайд: {e}")
-            return
+            return None
+
+def find_content_placeholder(slide):
+    """Ищет на слайде плейсхолдер контента (любой, кроме заголовка)."""
+    for shape in slide.placeholders:
+        if hasattr(shape, 'placeholder_format') and shape.placeholder_format.type != 1:  # Не заголовок
+            if hasattr(shape, 'text_frame'):
+                return shape
+            break
+    return None
+
+def set_slide_title(slide, title):
+    """Записывает текст заголовка слайда."""
+    try:
+        title_shape = slide.shapes.title
+        if title_shape and hasattr(title_shape, 'text_frame'):
+            # Очищаем и устанавливаем текст
+            tf = title_shape.text_frame
+            tf.clear()
+            p = tf.add_paragraph()
+            run = p.add_run()
+            run.text = title[:50]  # Ограничиваем длину
+        else:
+            print("Не найден подходящий шейп для заголовка")
+    except Exception as e:
+        print(f"Ошибка при установке заголовка: {e}")
+
+def append_bullet(content_box, line):
+    """Добавляет пункт в плейсхолдер контента."""
+    p = content_box.text_frame.add_paragraph()
+    run = p.add_run()
+    # Просто добавляем текст без дополнительного маркера
+    run.text = line[:100]  # Ограничиваем длину
 
-    # Парсим дизайн
-    design = parse_design_suggestions(design_suggestions)
+def resolve_design(design_suggestions):
+    """Возвращает словарь дизайна (в структурном режиме он уже готов, иначе парсим текст)."""
+    if isinstance(design_suggestions, dict):
+        return design_suggestions
+    return parse_design_suggestions(design_suggestions)
+
+def apply_slide_design(slide, design_suggestions):
+    """Применяет дизайн (фон, цвета, шрифты) к уже заполненному слайду."""
+    design = resolve_design(design_suggestions)
     main_color = design['main_color']
     accent_color = design['accent_color']
     title_font = design['title_font']
@@ -295,57 +835,282 @@ def create_slide(presentation, title, content, design_suggestions):
     # Определяем контрастный цвет текста на основе яркости фона
     # Исправлено: используем индексирование для доступа к компонентам цвета
     brightness = sum([main_color[0], main_color[1], main_color[2]]) / 3
-    text_color = RGBColor(0, 0, 0) if brightness > 128 else RGBColor(255, 255, 255)
+    text_color = contrast_text_color(main_color)
     print(f"ℹ️ Яркость фона: {brightness:.0f}, выбран цвет текста: #{text_color[0]:02x}{text_color[1]:02x}{text_color[2]:02x}")
 
-    # 2. Устанавливаем заголовок
+    # 2. Стилизуем заголовок
     try:
         title_shape = slide.shapes.title
         if title_shape and hasattr(title_shape, 'text_frame'):
-            # Очищаем и устанавливаем текст
-            tf = title_shape.text_frame
-            tf.clear()
-            p = tf.add_paragraph()
-            run = p.add_run()
-            run.text = title[:50]  # Ограничиваем длину
-            
-            # Применяем стиль
-            run.font.color.rgb = accent_color
-            if title_font: run.font.name = title_font
+            for p in title_shape.text_frame.paragraphs:
+                for run in p.runs:
+                    run.font.color.rgb = accent_color
+                    if title_font: run.font.name = title_font
             
             # Исправлено: используем индексирование для доступа к компонентам цвета
             print(f"🎨 Стилизован заголовок: Цвет #{accent_color[0]:02x}{accent_color[1]:02x}{accent_color[2]:02x}, Шрифт {title_font or 'default'}")
-        else:
-            print("Не найден подходящий шейп для заголовка")
     except Exception as e:
         print(f"Ошибка при стилизации заголовка: {e}")
 
-    # 3. Устанавливаем контент
+    # 3. Стилизуем контент
     try:
-        content_box = None
-        # Ищем подходящий плейсхолдер контента
-        for shape in slide.placeholders:
-            if hasattr(shape, 'placeholder_format') and shape.placeholder_format.type != 1:  # Не заголовок
-                content_box = shape
-                break
-        
-        if content_box and hasattr(content_box, 'text_frame'):
-            tf = content_box.text_frame
-            tf.clear()
-            
-            for i, line in enumerate(content[:3]):  # Макс. 3 пункта
-                p = tf.add_paragraph()
-                run = p.add_run()
-                # Просто добавляем текст без дополнительного маркера
-                run.text = line[:100]  # Ограничиваем длину
-                run.font.color.rgb = text_color
-                if text_font: run.font.name = text_font
+        content_box = find_content_placeholder(slide)
+        if content_box:
+            for p in content_box.text_frame.paragraphs:
+                for run in p.runs:
+                    run.font.color.rgb = text_color
+                    if text_font: run.font.name = text_font
             
             print(f"🎨 Стилизован контент: Цвет #{text_color[0]:02x}{text_color[1]:02x}{text_color[2]:02x}, Шрифт {text_font or 'default'}")
+    except Exception as e:
+        print(f"Ошибка при стилизации контента: {e}")
+
+def create_slide(presentation, title, content, design_suggestions):
+    """Создаёт слайд и применяет базовый дизайн, возвращает слайд или None.
+
+    Если design_suggestions равен None, слайд не стилизуется и наследует
+    тему презентации; иначе дизайн применяется к слайду поверх темы.
+    """
+    slide = add_slide(presentation)
+    if slide is None:
+        return None
+
+    set_slide_title(slide, title)
+
+    try:
+        content_box = find_content_placeholder(slide)
+        if content_box:
+            content_box.text_frame.clear()
+            for line in content[:3]:  # Макс. 3 пункта
+                append_bullet(content_box, line)
         else:
             print("Не найден плейсхолдер для контента")
     except Exception as e:
-        print(f"Ошибка при стилизации контента: {e}")
+        print(f"Ошибка при заполнении контента: {e}")
+
+    if design_suggestions is not None:
+        apply_slide_design(slide, design_suggestions)
+    return slide
+
+def ollama_stream_lines(prompt, temperature, kind="stream", client=None):
+    """Читает потоковый (NDJSON) ответ Ollama и отдаёт строки по мере их завершения.
+
+    Запрос идёт через пул серверов клиента (по умолчанию get_client()) без
+    дублирования. Кэш ответов (get_cache) не используется: потоковый ответ
+    нужен по мере генерации, а не целиком, поэтому в потоковом режиме
+    повторная фраза снова отправляется модели.
+    """
+    client = client or get_client()
+    payload = {
+        "model": MODEL_NAME,
+        "prompt": prompt,
+        "stream": True,
+        "keep_alive": KEEP_ALIVE,
+        "options": {"temperature": temperature}
+    }
+    with tracer.span(f"ollama_{kind}_stream") as attrs, \
+            client.endpoints.post(payload, timeout=OLLAMA_TIMEOUT, kind=f"{kind}_stream",
+                                  stream=True) as response:
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(f"код {response.status_code}", response=response)
+        buffer = ""
+        for raw_chunk in response.iter_lines():
+            if not raw_chunk:
+                continue
+            chunk = json.loads(raw_chunk)
+            buffer += chunk.get("response", "")
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                yield line
+            if chunk.get("done"):
+                client.record_prompt_eval(kind, prompt, chunk)
+                if attrs is not None:
+                    _record_ollama_usage(kind, chunk, attrs)
+                break
+        if buffer:
+            yield buffer
+
+def stream_slide_events(text, timings=None, with_design=True, client=None):
+    """Генерирует слайд потоком и отдаёт события по мере готовности.
+
+    События — пары (вид, значение): ("title", заголовок) после первой
+    строки заголовка, ("bullet", пункт) после каждого элемента списка,
+    ("failed", (заголовок, пункты)) при ошибке запроса и в конце
+    ("design", дизайн), если with_design. Дизайн генерируется параллельно
+    с контентом. В timings записывается время до первого пункта (first_bullet);
+    оно же уходит в метрики трассировщика. client — клиент Ollama (по
+    умолчанию get_client()).
+    """
+    if timings is None:
+        timings = {}
+    client = client or get_client()
+    started = time.perf_counter()
+    try:
+        # --- 1. Заголовок: берём первую непустую строку ---
+        print("Запрашиваю заголовок (поток)...")
+        title_response = ""
+        for line in ollama_stream_lines(build_title_prompt(text), 0.3, "title", client):
+            title_response = line.strip().replace('"', '')
+            if title_response:
+                break
+        timings["title"] = time.perf_counter() - started
+        if not title_response:
+            print("Получен пустой заголовок от API")
+            title_response = "Тема: " + text[:20]  # Создаем заголовок из начала текста
+        print(f"Заголовок: {title_response}")
+        yield "title", title_response
+
+        # --- 2. Дизайн параллельно, контент потоком ---
+        if with_design:
+            design_future = client.pool.submit(tracer.bind(_timed), "design", timings, fetch_design,
+                                               title_response, None, client)
+
+        print("Запрашиваю контент (поток)...")
+        bullets = 0
+        for line in ollama_stream_lines(build_content_prompt(title_response, text), 0.5, "content", client):
+            clean_lines = parse_content_lines(line)
+            if not clean_lines:
+                continue
+            bullets += 1
+            if bullets == 1:
+                timings["first_bullet"] = time.perf_counter() - started
+                tracer.observe("first_bullet", timings["first_bullet"])
+                print(f"⏱️ Первый пункт через {timings['first_bullet']:.2f}с")
+            yield "bullet", clean_lines[0]
+        timings["content"] = time.perf_counter() - started - timings["title"]
+
+        if not bullets:
+            print("Не удалось распарсить контент из ответа API")
+            for i in range(3):
+                yield "bullet", Placeholder(f"Ключевой аспект {i+1} темы '{title_response}'")
+
+        if with_design:
+            yield "design", design_future.result()
+
+    except requests.exceptions.Timeout:
+        print("Превышено время ожидания ответа от API")
+        yield "failed", (Placeholder("Таймаут API"), [Placeholder("Сервер не ответил вовремя")])
+    except requests.exceptions.ConnectionError:
+        print("Не удалось подключиться к серверам Ollama")
+        yield "failed", (Placeholder("Ошибка соединения"), [Placeholder("Проверьте работу Ollama")])
+    except requests.exceptions.HTTPError as e:
+        print(f"Ошибка API ({e})")
+        yield "failed", (Placeholder("Ошибка API"), [Placeholder("Не удалось получить ответ от API")])
+    except Exception as e:
+        print(f"Неожиданная ошибка при генерации: {e}")
+        yield "failed", (Placeholder("Ошибка"), [Placeholder("Технические проблемы при генерации")])
+    finally:
+        timings["total"] = time.perf_counter() - started
+
+class StreamedSlide:
+    """Слайд, который генерируется потоком в фоне, пока писатель занят предыдущими.
+
+    События stream_slide_events копятся в очереди, а писатель применяет их
+    к слайду через stream_slide(..., events=streamed.events()), как только
+    до слайда дойдёт очередь. При for_theme дизайн запрашивается для темы
+    презентации: он не попадает в события, а сохраняется в theme_design.
+    """
+
+    def __init__(self, text, with_design=True, for_theme=False, client=None):
+        self.text = text
+        self.client = client
+        self.with_design = with_design and not for_theme
+        self.for_theme = for_theme
+        self.theme_design = None
+        self.timings = {}
+        self._events = queue.Queue()
+
+    def start(self, on_done=None):
+        thread = threading.Thread(target=tracer.bind(self._run), args=(on_done,),
+                                  name="stream-slide", daemon=True)
+        thread.start()
+        return self
+
+    def _run(self, on_done):
+        try:
+            events = stream_slide_events(self.text, self.timings, self.with_design or self.for_theme,
+                                         self.client)
+            for kind, value in events:
+                if kind == "design" and self.for_theme:
+                    self.theme_design = value
+                    continue
+                self._events.put((kind, value))
+        finally:
+            self._events.put(None)
+            if on_done is not None:
+                on_done()
+
+    def events(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            yield event
+
+def stream_slide(presentation, text, timings=None, on_update=None, with_design=True, lock=None,
+                 events=None, client=None):
+    """Строит слайд по мере генерации: заголовок, затем пункт за пунктом.
+
+    Заголовок записывается на слайд, как только завершена его первая строка,
+    каждый пункт — как только завершён элемент списка; дизайн применяется
+    в конце. После каждого изменения вызывается on_update(slide), если он
+    передан. events — уже идущая генерация (StreamedSlide.events()); без
+    него события запрашиваются здесь же через stream_slide_events. Если
+    передан lock, он берётся только на время каждого изменения слайда,
+    а не на всю генерацию. Возвращает (заголовок, пункты, дизайн), как
+    generate_slide_data; при with_design=False дизайн не запрашивается и
+    слайд наследует тему презентации.
+    """
+    design_suggestions = DESIGN_PLACEHOLDER if with_design else None
+
+    if not text:
+        print("Получен пустой текст для генерации")
+        return "", [], design_suggestions
+
+    guard = lock if lock is not None else nullcontext()
+    with guard:
+        slide = add_slide(presentation)
+        if slide is None:
+            return "", [], design_suggestions
+        content_box = find_content_placeholder(slide)
+        if content_box:
+            content_box.text_frame.clear()
+
+    def notify():
+        if on_update is not None:
+            on_update(slide)
+
+    if events is None:
+        events = stream_slide_events(text, timings, with_design, client)
+    title_response = ""
+    content_lines = []
+    for kind, value in events:
+        if kind == "design":
+            design_suggestions = value
+            continue
+        with guard:
+            if kind == "title":
+                title_response = value
+                set_slide_title(slide, title_response)
+            elif kind == "bullet":
+                content_lines.append(value)
+                if content_box and len(content_lines) <= 3:  # Макс. 3 пункта
+                    append_bullet(content_box, value)
+            elif kind == "failed":
+                # Перезаписываем частично заполненный слайд сообщением об ошибке
+                title_response, content_lines = value
+                set_slide_title(slide, title_response)
+                if content_box:
+                    content_box.text_frame.clear()
+                    for line in content_lines:
+                        append_bullet(content_box, line)
+            notify()
+
+    with guard:
+        if design_suggestions is not None:
+            apply_slide_design(slide, design_suggestions)
+        notify()
+    return title_response, content_lines, design_suggestions
 
 
 def refresh_powerpoint():
@@ -390,81 +1155,377 @@ def refresh_powerpoint():
     except Exception as e:
         print(f"Неожиданная ошибка при обновлении PowerPoint: {e}")
 
+def slide_text(slide):
+    """Читает текущие заголовок и пункты слайда (для предпросмотра во время потоковой генерации)."""
+    title_shape = slide.shapes.title
+    title = title_shape.text_frame.text.strip() if title_shape is not None else ""
+    content_box = find_content_placeholder(slide)
+    content = []
+    if content_box:
+        content = [p.text for p in content_box.text_frame.paragraphs if p.text.strip()]
+    return title, content
+
+def load_keyword_router():
+    """Загружает разделы config.json в индекс ключевых фраз или возвращает None."""
+    if not KEYWORD_ROUTER_ENABLED or not os.path.exists(CONFIG_FILE):
+        return None
+    try:
+        router = KeywordRouter.from_config(CONFIG_FILE, KEYWORD_ROUTER_MIN_MATCHES,
+                                            KEYWORD_ROUTER_MIN_COVERAGE)
+        print(f"🟢 Загружено разделов из {CONFIG_FILE}: {len(router.sections)}")
+        return router
+    except (OSError, ValueError) as e:
+        print(f"Не удалось загрузить {CONFIG_FILE}: {e}")
+        return None
+
+def route_slide(router, text):
+    """Возвращает (заголовок, пункты, дизайн) из config.json, если фраза уверенно совпала."""
+    if router is None:
+        return None
+    section = router.match(text)
+    if section is None:
+        return None
+    print(f"⚡ Слайд из {CONFIG_FILE}: {section['title']} (доля попаданий {router.hit_rate():.0%})")
+    # Раздел может задать собственный дизайн; иначе слайд наследует тему
+    design = None
+    if section.get("design") is not None:
+        try:
+            design = design_from_config(section["design"])
+        except ValueError as e:
+            print(f"⚠️ Дизайн раздела «{section['title']}» в {CONFIG_FILE} не применён: {e}")
+    return section["title"], list(section.get("content", [])), design
+
+def design_from_config(config_design):
+    """Приводит дизайн раздела config.json к словарю, как у parse_design_suggestions.
+
+    Цвета задаются HEX-строками («#FAFAFA» или «FAFAFA»), шрифты и фон —
+    строками; незаданные цвета берутся по умолчанию. При неверном значении
+    выбрасывает ValueError.
+    """
+    from pptx.dml.color import RGBColor
+    if not isinstance(config_design, dict):
+        raise ValueError("дизайн должен быть объектом")
+    design = {}
+    for key in ('main_color', 'accent_color'):
+        value = config_design.get(key)
+        if value is None:
+            design[key] = None
+        elif isinstance(value, str) and re.fullmatch(r'#?[0-9A-Fa-f]{6}', value.strip()):
+            design[key] = RGBColor.from_string(value.strip().lstrip('#').upper())
+        else:
+            raise ValueError(f"{key}: ожидается цвет вида #RRGGBB, получено {value!r}")
+    for key in ('title_font', 'text_font', 'background_idea'):
+        value = config_design.get(key)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{key}: ожидается строка, получено {value!r}")
+        design[key] = (value or "").strip() or None
+    return apply_design_defaults(design)
+
+def slide_to_journal(title, content, design_suggestions):
+    """Готовит запись журнала о слайде (цвета дизайна — в виде HEX-строк)."""
+    from pptx.dml.color import RGBColor
+    if isinstance(design_suggestions, dict):
+        design_suggestions = {
+            key: str(value) if isinstance(value, RGBColor) else value
+            for key, value in design_suggestions.items()
+        }
+    return {"title": title, "content": content, "design": design_suggestions}
+
+def slide_from_journal(entry):
+    """Восстанавливает (заголовок, пункты, дизайн) из записи журнала."""
+    from pptx.dml.color import RGBColor
+    design_suggestions = entry.get("design", "Стандартный дизайн")
+    if isinstance(design_suggestions, dict):
+        design_suggestions = dict(design_suggestions)
+        for color_key in ('main_color', 'accent_color'):
+            if design_suggestions.get(color_key):
+                design_suggestions[color_key] = RGBColor.from_string(design_suggestions[color_key])
+    return entry.get("title", ""), entry.get("content", []), design_suggestions
+
+def open_presentation(path=None):
+    """Открывает .pptx (или создаёт пустую презентацию); pptx импортируется только здесь."""
+    from pptx import Presentation
+    return Presentation(path)
+
+def open_deck(theme_state, on_saved):
+    """Открывает презентацию и возвращает объект сохранения (DeckSaver или PartedDeck).
+
+    Заполняет theme_state["design"] темой, уже записанной в файл.
+    """
+    if DECK_PARTS_ENABLED:
+        def new_part():
+            presentation = open_presentation()
+            if theme_state["design"] is not None:
+                apply_deck_theme(presentation, theme_state["design"])
+            return presentation
+
+        def open_base():
+            presentation = open_presentation(PPTX_FILE if os.path.exists(PPTX_FILE) else None)
+            if theme_state["design"] is not None and not deck_theme_applied(presentation):
+                apply_deck_theme(presentation, theme_state["design"])
+            return presentation
+
+        theme_state["design"] = read_file_theme(PPTX_FILE) if os.path.exists(PPTX_FILE) else None
+        deck = PartedDeck(PPTX_FILE, new_part, open_base,
+                          lambda presentation, entry: create_slide(presentation, *slide_from_journal(entry)),
+                          max_slides=DECK_PART_MAX_SLIDES, max_bytes=DECK_PART_MAX_MB * 1024 * 1024,
+                          debounce=SAVE_DEBOUNCE_SECONDS, max_delay=SAVE_MAX_DELAY_SECONDS,
+                          on_saved=on_saved)
+        print(f"🟢 Слайды пишутся частями, {PPTX_FILE} будет дополнен при завершении")
+        # Первая часть (и импорт pptx) готовится, пока калибруется микрофон
+        threading.Thread(target=deck.prepare, name="deck-prepare", daemon=True).start()
+        return deck
+
+    if os.path.exists(PPTX_FILE):
+        prs = open_presentation(PPTX_FILE)
+        print(f"🟢 Загружена презентация: {PPTX_FILE}")
+    else:
+        prs = open_presentation()
+        print("🟢 Создана новая презентация")
+        prs.save(PPTX_FILE)
+
+    # Доигрываем слайды, не попавшие в файл при прошлом запуске
+    journal = SlideJournal(JOURNAL_FILE)
+    saved = journal.discard_saved(len(prs.slides))
+    if saved:
+        print(f"♻️ {saved} слайдов из журнала уже есть в {PPTX_FILE}, пропускаем")
+    pending = journal.pending()
+    if pending:
+        print(f"♻️ Восстановление {len(pending)} слайдов из журнала {JOURNAL_FILE}")
+        for entry in pending:
+            create_slide(prs, *slide_from_journal(entry))
+    theme_state["design"] = read_deck_theme(prs)
+    return DeckSaver(prs, PPTX_FILE, debounce=SAVE_DEBOUNCE_SECONDS,
+                     max_delay=SAVE_MAX_DELAY_SECONDS, journal=journal,
+                     on_saved=on_saved)
+
 def main():
+    if TRACING_ENABLED:
+        tracer.configure(True, TRACE_FILE)
+        if METRICS_PORT:
+            tracer.serve(METRICS_PORT)
+            print(f"📈 Метрики: http://127.0.0.1:{METRICS_PORT}/metrics, трассы: {TRACE_FILE}")
+
+    if WARM_UP_ENABLED:
+        # Модель загружается, пока открывается и калибруется микрофон
+        threading.Thread(target=warm_up_model, name="warm-up", daemon=True).start()
+
+    engine, capture = open_capture()
+
+    preview = None
+    if PREVIEW_ENABLED:
+        try:
+            preview = PreviewServer(PREVIEW_PORT).start()
+            print(f"🖥️ Предпросмотр: {preview.url}")
+        except OSError as e:
+            print(f"Не удалось запустить предпросмотр на порту {PREVIEW_PORT}: {e}")
+
+    def on_saved():
+        tracer.observe("save", saver.last_latency, bytes=saver.last_bytes, slides=saver.slide_count())
+        if POWERPOINT_REFRESH:
+            refresh_powerpoint()
+
+    # В режиме темы дизайн запрашивается только для первого сгенерированного слайда
+    theme_state = {"needed": False, "design": None}
     # Создаём или загружаем существующую презентацию
     try:
-        if os.path.exists(PPTX_FILE):
-            prs = Presentation(PPTX_FILE)
-            print(f"🟢 Загружена презентация: {PPTX_FILE}")
-        else:
-            prs = Presentation()
-            print("🟢 Создана новая презентация")
-            prs.save(PPTX_FILE)
+        saver = open_deck(theme_state, on_saved)
     except Exception as e:
         print(f"Ошибка при открытии/создании презентации: {e}")
+        if preview is not None:
+            preview.close()
+        if engine is not None:
+            engine.close()
         return
+    if DECK_PARTS_ENABLED:
+        theme_state["needed"] = DECK_THEME_ENABLED and theme_state["design"] is None
+    else:
+        theme_state["needed"] = DECK_THEME_ENABLED and not deck_theme_applied(saver.presentation)
 
-    try:
-        while True:
-            text = recognize_speech().strip()
-            if not text:
-                continue
-                
-            if "стоп" in text.lower():
-                print("Получена команда 'стоп'. Завершение работы...")
-                break
+    router = load_keyword_router()
 
-            print("\n⏳ Генерация данных слайда...")
-            title, content, design_suggestions = generate_slide_data(text)
-            
-            print(f"\n📄 Заголовок: {title}")
-            print("📌 Контент:")
-            for item in content:
-                print(f"   • {item}")
+    theme_lock = threading.Lock()
+    stream_slots = threading.Semaphore(PIPELINE_WORKERS)
+
+    def claim_theme_design():
+        """Возвращает True, если этот слайд должен запросить дизайн для темы."""
+        with theme_lock:
+            needed = theme_state["needed"]
+            theme_state["needed"] = False
+            return needed
+
+    def release_theme_design():
+        """Дизайн для темы не получен — его запросит следующий слайд."""
+        print("⚠️ Не удалось получить дизайн для темы, запросим его со следующим слайдом")
+        with theme_lock:
+            theme_state["needed"] = True
+
+    def apply_theme(design_suggestions):
+        design = resolve_design(design_suggestions)
+        with saver.lock:
+            apply_deck_theme(saver.presentation, design)
+            theme_state["design"] = design
+        saver.request_save()
+
+    def publish_preview(title, content, design_suggestions):
+        """Показывает в браузере только что изменённый (последний) слайд."""
+        if preview is None:
+            return
+        with tracer.span("preview"):
+            if design_suggestions is None:
+                design = theme_state["design"]
+            else:
+                design = resolve_design(design_suggestions)
+            preview.publish(saver.slide_count(), render_slide_html(title, content, design))
+
+    def generate(text):
+        routed = route_slide(router, text)
+        if routed is not None:
+            return routed
+        print("\n⏳ Генерация данных слайда...")
+        if STREAMING_GENERATION:
+            # Слайд генерируется в фоне, а писатель переносит его в презентацию
+            # по мере готовности; одновременно идёт не больше PIPELINE_WORKERS генераций
+            stream_slots.acquire()
+            for_theme = DECK_THEME_ENABLED and claim_theme_design()
+            return StreamedSlide(text, with_design=not DECK_THEME_ENABLED,
+                                 for_theme=for_theme).start(on_done=stream_slots.release)
+        if not DECK_THEME_ENABLED:
+            return generate_slide_data(text)
+        for_theme = claim_theme_design()
+        title, content, design_suggestions = generate_slide_data(text, with_design=for_theme)
+        if for_theme:
+            # Заглушку вместо дизайна нельзя записывать в тему: тема пишется один раз
+            if isinstance(design_suggestions, Placeholder):
+                release_theme_design()
+            else:
+                apply_theme(design_suggestions)
+        return title, content, None
+
+    def write(utterance, result):
+        if isinstance(result, StreamedSlide):
+            # saver.lock берётся только на каждое изменение слайда, чтобы фоновое
+            # сохранение не ждало всю генерацию
+            title, content, design_suggestions = stream_slide(
+                saver.presentation, result.text, timings=result.timings,
+                with_design=result.with_design, lock=saver.lock, events=result.events(),
+                on_update=lambda slide: publish_preview(*slide_text(slide), None))
+            if result.for_theme:
+                if result.theme_design is None or isinstance(result.theme_design, Placeholder):
+                    release_theme_design()
+                else:
+                    apply_theme(result.theme_design)
+            with saver.lock:
+                publish_preview(title, content, design_suggestions)
+                saver.record_slide(slide_to_journal(title, content, design_suggestions))
+        else:
+            title, content, design_suggestions = result
+            print("\n🛠️ Создание и стилизация слайда...")
+            with saver.lock:
+                with tracer.span("render"):
+                    create_slide(saver.presentation, title, content, design_suggestions)
+                publish_preview(title, content, design_suggestions)
+                saver.record_slide(slide_to_journal(title, content, design_suggestions))
+
+        print(f"\n📄 Заголовок: {title}")
+        print("📌 Контент:")
+        for item in content:
+            print(f"   • {item}")
+        if design_suggestions is None:
+            print("\n🎨 Оформление: тема презентации")
+        else:
             print("\n🎨 Предложения по дизайну (от Ollama):")
             print(design_suggestions)
+        # Слайд уже в предпросмотре; файл сохраняет фоновый поток
+        print("✅ Слайд добавлен, сохранение запланировано")
+        print(f"📊 Очередь фраз: {utterance_pipeline.queue.stats()}")
 
-            print("\n🛠️ Создание и стилизация слайда...")
-            create_slide(prs, title, content, design_suggestions)
+    def is_stop(text):
+        if "стоп" in text.lower():
+            print("Получена команда 'стоп'. Завершение работы...")
+            return True
+        return False
 
-            print("\n💾 Сохранение файла...")
-            try:
-                prs.save(PPTX_FILE)
-                print("   Файл сохранен.")
-                print("🔄 Обновление PowerPoint...")
-                refresh_powerpoint()
-                print("✅ Слайд добавлен и обновлен!")
-            except Exception as e:
-                print(f"Ошибка при сохранении: {e}")
-                time.sleep(2)
-                try:
-                    # Повторная попытка сохранения
-                    prs.save(PPTX_FILE)
-                    refresh_powerpoint()
-                    print("✅ Повторное сохранение успешно!")
-                except Exception as e2:
-                    print(f"Ошибка при повторном сохранении: {e2}")
-                    
+    # Захват речи, генерация и запись работают в отдельных потоках,
+    # так что микрофон слушается и во время генерации слайда
+    utterance_pipeline = SlidePipeline(
+        capture, generate, write, is_stop,
+        workers=PIPELINE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE,
+        overflow=PIPELINE_OVERFLOW, stale_after=PIPELINE_STALE_SECONDS
+    )
+
+    try:
+        utterance_pipeline.start()
+        print(f"🚀 Готов к работе за {time.perf_counter() - _STARTED:.2f}с, "
+              f"память {peak_rss_mb():.0f} МБ")
+        while not utterance_pipeline.join(timeout=0.5):
+            pass
+        if utterance_pipeline.capture_error is not None:
+            # Захват так и не заработал — завершаемся с исходной ошибкой
+            raise utterance_pipeline.capture_error
     except KeyboardInterrupt:
         print("\nПрервано пользователем")
+        utterance_pipeline.stop()
+        # Дописываем уже принятые фразы
+        utterance_pipeline.join(timeout=60)
     finally:
-        try:
-            prs.save(PPTX_FILE)
+        if saver.close():
             print(f"\n💾 Финальное сохранение презентации как: {PPTX_FILE}")
-        except Exception as e:
-            print(f"Ошибка при финальном сохранении: {e}")
+        tracer.close()
+        if engine is not None:
+            engine.close()
+        if preview is not None:
+            preview.close()
+        print(f"📊 Сохранений: {saver.flushes}, ошибок: {saver.failures}, "
+              f"пиковая память {peak_rss_mb():.0f} МБ")
+        if router is not None:
+            print(f"📊 Слайдов из {CONFIG_FILE}: {router.hits} из {router.lookups} "
+                  f"(доля попаданий {router.hit_rate():.0%})")
+        cache = get_cache()
+        if cache is not None:
+            stats = cache.stats()
+            print(f"📊 Кэш: попаданий {stats['hits']} (с диска {stats['disk_hits']}), "
+                  f"промахов {stats['misses']}, доля попаданий {stats['hit_rate']:.0%}")
+            cache.close()
+        reuse = list(get_client().prompt_reuse.values())
+        reused = sum(stats.reused for stats in reuse)
+        if reused:
+            saved = sum(stats.saved_seconds for stats in reuse)
+            tokens = sum(stats.reused_tokens for stats in reuse)
+            slides = max(1, saver.slide_count())
+            print(f"📊 Инструкции из кэша Ollama: {reused} запросов, ~{tokens} токенов, оценка промптов "
+                  f"быстрее на {saved:.1f}с ({saved / slides:.2f}с на слайд)")
+        if OLLAMA_URLS and len(OLLAMA_URLS) > 1:
+            stats = get_endpoints().stats()
+            print(f"📊 Серверы Ollama: дублирований {stats['hedges']} (выиграли {stats['hedge_wins']}), "
+                  f"переключений {stats['failovers']}")
+            for endpoint in stats['endpoints']:
+                state = "в работе" if endpoint['available'] else "исключён"
+                print(f"   • {endpoint['url']}: {state}, запросов {endpoint['requests']}, "
+                      f"ошибок {endpoint['failures']}, задержка {endpoint['latency']}с")
 
-if __name__ == "__main__":
-    # Проверка соединения с Ollama
+def check_ollama(url=None, verbose=True):
+    """Проверяет, что сервер Ollama отвечает. Возвращает True, если всё в порядке.
+
+    С verbose=False ничего не печатает — так пул серверов проверяет исключённые серверы.
+    """
+    root_url = (url or OLLAMA_URL).replace("/api/generate", "/")
+    log = print if verbose else (lambda *args: None)
     try:
-        response = requests.get(OLLAMA_URL.replace("/api/generate", "/"), timeout=5)
-        print(f"Проверка Ollama: {OLLAMA_URL.replace('/api/generate', '/')}...")
+        log(f"Проверка Ollama: {root_url}...")
+        response = requests.get(root_url, timeout=5)
         if response.status_code == 200:
-            print("🟢 Соединение с Ollama ОК.")
-            main()
-        else:
-            print(f"🟠 Ollama ответила со статусом {response.status_code}. Проверьте сервер.")
+            log("🟢 Соединение с Ollama ОК.")
+            return True
+        log(f"🟠 Ollama ответила со статусом {response.status_code}. Проверьте сервер.")
     except requests.exceptions.ConnectionError:
-        print("‼️ Не удалось подключиться к Ollama. Убедитесь, что сервер запущен.")
+        log("‼️ Не удалось подключиться к Ollama. Убедитесь, что сервер запущен.")
     except Exception as e:
-        print(f"Ошибка при проверке соединения с Ollama: {e}")
+        log(f"Ошибка при проверке соединения с Ollama: {e}")
+    return False
+
+if __name__ == "__main__":
+    # Проверка соединения с Ollama: достаточно одного работающего сервера,
+    # остальные пул вернёт в работу, когда они начнут отвечать
+    if any([check_ollama(url) for url in OLLAMA_URLS or [OLLAMA_URL]]):
+        main()
@@ -0,0 +1,186 @@
+import itertools
+import json
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Границы корзин гистограмм, секунды
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_NOOP = nullcontext()
+
+
+def peak_rss_mb():
+    """Пиковый объём резидентной памяти процесса, МБ."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class Tracer:
+    """Замеры этапов «захват → генерация → отрисовка → сохранение».
+
+    Каждая фраза получает идентификатор трассы (new_trace); этапы,
+    выполненные в том же потоке, привязываются к нему автоматически, а в
+    другие потоки трасса передаётся через bind(). Замеры копятся в
+    гистограммах (отдаются в формате Prometheus) и пишутся в JSONL-файл.
+    Выключенный трассировщик почти ничего не стоит: span() возвращает
+    пустой контекст.
+    """
+
+    def __init__(self, enabled=False, trace_file=None):
+        self.enabled = False
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._trace = None
+        self.configure(enabled, trace_file)
+
+    def configure(self, enabled, trace_file=None):
+        """Включает или выключает трассировку и задаёт JSONL-файл трасс."""
+        self.close()
+        with self._lock:
+            self._trace = open(trace_file, "a", encoding="utf-8") if enabled and trace_file else None
+            self.enabled = enabled
+
+    def new_trace(self):
+        """Начинает трассу новой фразы в текущем потоке и возвращает её идентификатор."""
+        if not self.enabled:
+            return None
+        trace_id = next(self._ids)
+        self._local.trace_id = trace_id
+        return trace_id
+
+    def current(self):
+        return getattr(self._local, "trace_id", None)
+
+    def set_current(self, trace_id):
+        self._local.trace_id = trace_id
+
+    def bind(self, func):
+        """Оборачивает функцию так, чтобы в другом потоке она работала в текущей трассе."""
+        if not self.enabled:
+            return func
+        trace_id = self.current()
+
+        def bound(*args, **kwargs):
+            self._local.trace_id = trace_id
+            return func(*args, **kwargs)
+        return bound
+
+    def span(self, stage, **attrs):
+        """Контекст, замеряющий этап. В attrs можно дописывать значения внутри блока."""
+        if not self.enabled:
+            return _NOOP
+        return self._span(stage, attrs)
+
+    @contextmanager
+    def _span(self, stage, attrs):
+        started = time.perf_counter()
+        wall_started = time.time()
+        try:
+            yield attrs
+        finally:
+            self.observe(stage, time.perf_counter() - started, start=wall_started, **attrs)
+
+    def observe(self, stage, seconds, start=None, **attrs):
+        """Записывает готовый замер этапа."""
+        if not self.enabled:
+            return
+        trace_id = attrs.pop("trace_id", None) or self.current()
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+            if self._trace is not None:
+                record = {"trace": trace_id, "stage": stage,
+                          "start": start if start is not None else time.time() - seconds,
+                          "seconds": round(seconds, 6)}
+                record.update(attrs)
+                self._trace.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._trace.flush()
+
+    def count(self, name, value=1, **labels):
+        """Увеличивает счётчик (например, число токенов Ollama)."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def render_prometheus(self):
+        """Текущие метрики в текстовом формате Prometheus."""
+        lines = ["# TYPE slide_stage_seconds histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'slide_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'slide_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'slide_stage_seconds_sum{{stage="{stage}"}} {histogram.total}')
+                lines.append(f'slide_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Поднимает в фоне HTTP-эндпоинт /metrics. Возвращает сервер."""
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                data = tracer.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+    def close(self):
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+
+# Общий трассировщик процесса; включается через tracer.configure()
+tracer = Tracer()
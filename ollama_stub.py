@@ -0,0 +1,224 @@
+"""Локальная замена Ollama для тестов и замеров: реализует /api/generate.
+
+Пример:
+    python ollama_stub.py --port 11434 --latency 0.2 --token-rate 40 --error-rate 0.05
+
+Как и Ollama, держит вычисленные промпты в нескольких слотах (--slots,
+аналог OLLAMA_NUM_PARALLEL): начало промпта, совпадающее с промптом в
+одном из слотов, берётся из кэша, и «вычисляются» только остальные токены
+(--prompt-rate задаёт скорость их оценки). prompt_eval_count и
+prompt_eval_duration сообщают только вычисленные токены.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Заготовленные ответы на русском языке для каждого вида промпта
+CANNED_TITLES = [
+    "Основы нейронных сетей",
+    "Машинное обучение на практике",
+    "Обработка естественного языка",
+    "Компьютерное зрение сегодня",
+]
+CANNED_CONTENT = [
+    "- Определение и ключевые понятия\n- Архитектура и принципы работы\n- Примеры использования в индустрии",
+    "* Сбор и подготовка данных\n* Обучение и проверка модели\n* Внедрение в продукт",
+]
+CANNED_DESIGN = (
+    "1. Цветовая палитра: основной #FAFAFA, акцентный #8FA6B8\n"
+    "2. Шрифты: заголовок: Montserrat Light, текст: Open Sans\n"
+    "3. Фон: минималистичный, однотонный светлый"
+)
+
+
+def canned_response(body, rng=random):
+    """Подбирает ответ по тексту промпта."""
+    prompt = body.get("prompt", "")
+    if body.get("format"):
+        return json.dumps({
+            "title": rng.choice(CANNED_TITLES),
+            "bullets": [line.lstrip("-* ") for line in rng.choice(CANNED_CONTENT).split("\n")],
+            "palette": {"main": "#FAFAFA", "accent": "#8FA6B8"},
+            "fonts": {"title": "Montserrat Light", "text": "Open Sans"},
+            "background": "минималистичный, однотонный светлый",
+        }, ensure_ascii=False)
+    if "дизайн" in prompt:
+        return CANNED_DESIGN
+    if "ключевых пункта" in prompt:
+        return rng.choice(CANNED_CONTENT)
+    return rng.choice(CANNED_TITLES)
+
+
+class StubSettings:
+    def __init__(self, latency=0.0, token_rate=0.0, error_rate=0.0, seed=None, prompt_rate=0.0,
+                 slots=4):
+        self.latency = latency  # секунд до первого токена
+        self.token_rate = token_rate  # токенов в секунду, 0 — без задержки
+        self.prompt_rate = prompt_rate  # токенов промпта в секунду, 0 — без задержки
+        self.error_rate = error_rate  # доля ответов с кодом 500
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.slots = [[] for _ in range(max(1, slots))]  # токены вычисленных промптов
+        self.slot_used = [0] * len(self.slots)  # номер последнего вычисления в слоте
+        self.evaluations = 0
+        self.lock = threading.Lock()
+
+    def evaluate_prompt(self, prompt):
+        """Возвращает число токенов промпта, которых нет в кэше слотов.
+
+        Как Ollama, ищет слот с самым длинным совпадающим началом. Если
+        промпт целиком продолжает этот слот, вычисляется в нём; иначе
+        совпадающее начало копируется в давно не использованный слот.
+        """
+        tokens = prompt.split()
+        with self.lock:
+            self.evaluations += 1
+            shared, best = -1, 0
+            for index, slot in enumerate(self.slots):
+                common = 0
+                for cached, token in zip(slot, tokens):
+                    if cached != token:
+                        break
+                    common += 1
+                if common > shared:
+                    shared, best = common, index
+            if shared < len(self.slots[best]):
+                best = self.slot_used.index(min(self.slot_used))
+            self.slots[best] = tokens
+            self.slot_used[best] = self.evaluations
+        # Последний токен вычисляется всегда, даже если промпт целиком в кэше
+        return max(1, len(tokens) - shared)
+
+
+def make_handler(settings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            data = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": "invalid JSON"})
+                return
+            if self.path != "/api/generate":
+                self._send_json(404, {"error": "not found"})
+                return
+
+            if not body.get("prompt"):
+                # Запрос без промпта только загружает модель
+                self._send_json(200, {"model": body.get("model"), "response": "",
+                                      "done": True, "done_reason": "load"})
+                return
+
+            with settings.lock:
+                settings.requests += 1
+                failed = settings.random.random() < settings.error_rate
+            time.sleep(settings.latency)
+            if failed:
+                self._send_json(500, {"error": "stub: simulated failure"})
+                return
+
+            # Начало, совпадающее с кэшем слотов, уже вычислено
+            prompt_tokens = settings.evaluate_prompt(body["prompt"])
+            prompt_seconds = prompt_tokens / settings.prompt_rate if settings.prompt_rate else 0.0
+            time.sleep(prompt_seconds)
+
+            with settings.lock:
+                text = canned_response(body, settings.random)
+            # Токенами считаем слова вместе с разделителями
+            tokens = [word + " " for word in text.split(" ")]
+            tokens[-1] = tokens[-1][:-1]
+            delay = 1.0 / settings.token_rate if settings.token_rate else 0.0
+            started = time.perf_counter()
+
+            if body.get("stream", True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(delay)
+                    self._write_chunk({"model": body.get("model"), "response": token, "done": False})
+                self._write_chunk(self._final(body, "", tokens, started, prompt_tokens, prompt_seconds))
+                self.wfile.write(b"0\r\n\r\n")
+                return
+
+            time.sleep(delay * len(tokens))
+            self._send_json(200, self._final(body, text, tokens, started, prompt_tokens, prompt_seconds))
+
+        def _write_chunk(self, payload):
+            data = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        @staticmethod
+        def _final(body, text, tokens, started, prompt_tokens, prompt_seconds):
+            eval_duration = int((time.perf_counter() - started) * 1e9)
+            return {
+                "model": body.get("model"),
+                "response": text,
+                "done": True,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prompt_seconds * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": eval_duration,
+            }
+
+    return Handler
+
+
+def start_stub(port=0, host="127.0.0.1", **settings):
+    """Запускает сервер в фоновом потоке. Возвращает (сервер, адрес /api/generate)."""
+    server = ThreadingHTTPServer((host, port), make_handler(StubSettings(**settings)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="ollama-stub", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/api/generate"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Локальная замена Ollama (/api/generate)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка до первого токена, с")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="токенов в секунду (0 — мгновенно)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов с ошибкой 500")
+    parser.add_argument("--prompt-rate", type=float, default=0.0,
+                        help="скорость оценки промпта, токенов в секунду (0 — мгновенно)")
+    parser.add_argument("--slots", type=int, default=4,
+                        help="сколько вычисленных промптов держать в кэше (как OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(StubSettings(
+        args.latency, args.token_rate, args.error_rate, args.seed, args.prompt_rate, args.slots)))
+    print(f"🟢 Замена Ollama слушает http://{args.host}:{args.port}/api/generate")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nОстановлено")
@@ -0,0 +1,404 @@
+import glob
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def atomic_write(path, data):
+    """Записывает байты во временный файл рядом с path и атомарно подменяет его."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.splitext(path)[1], dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SlideJournal:
+    """Журнал добавленных слайдов (JSONL рядом с презентацией).
+
+    Каждый слайд дописывается в журнал сразу, ещё до сохранения .pptx.
+    После успешного сохранения записи, попавшие в файл, удаляются из
+    журнала. При перезапуске оставшиеся записи можно доиграть в презентацию.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = self.load(path)
+
+    @staticmethod
+    def load(path):
+        entries = []
+        if not path or not os.path.exists(path):
+            return entries
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # Недописанная последняя строка после сбоя
+                    break
+        return entries
+
+    def pending(self):
+        with self._lock:
+            return list(self._entries)
+
+    def append(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            return len(self._entries)
+
+    def discard_saved(self, slide_count):
+        """Удаляет записи о слайдах, которые уже есть в файле из slide_count слайдов.
+
+        Так записи, оставшиеся после сбоя между сохранением .pptx и
+        mark_saved, не доигрываются повторно. Возвращает число удалённых записей.
+        """
+        with self._lock:
+            saved = 0
+            for entry in self._entries:
+                position = entry.get("position")
+                if position is None or position > slide_count:
+                    break
+                saved += 1
+        if saved:
+            self.mark_saved(saved)
+        return saved
+
+    def assign_positions(self, first):
+        """Нумерует записи позициями first, first + 1, ... и перезаписывает журнал."""
+        with self._lock:
+            for offset, entry in enumerate(self._entries):
+                entry["position"] = first + offset
+            data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in self._entries)
+            atomic_write(self.path, data.encode("utf-8"))
+
+    def mark_saved(self, count):
+        """Удаляет из журнала первые count записей, уже сохранённых в .pptx."""
+        with self._lock:
+            del self._entries[:count]
+            if self._entries:
+                data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in self._entries)
+                atomic_write(self.path, data.encode("utf-8"))
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class DeckSaver:
+    """Фоновое сохранение презентации с объединением частых запросов.
+
+    request_save() лишь помечает презентацию изменённой; фоновый поток
+    выжидает debounce секунд без новых изменений (но не дольше max_delay)
+    и сохраняет файл атомарно. Все изменения презентации должны
+    выполняться под saver.lock — под ним же презентация сериализуется
+    в память, а запись на диск идёт уже без блокировки. Записи, оставшиеся
+    в журнале от прошлого запуска, к моменту создания уже должны быть
+    доиграны в презентацию.
+    """
+
+    def __init__(self, presentation, path, debounce=1.0, max_delay=5.0, journal=None, on_saved=None,
+                 lock=None):
+        self.presentation = presentation
+        self.path = path
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.journal = journal
+        self.on_saved = on_saved
+        self.lock = lock or threading.RLock()
+        self.flushes = 0
+        self.failures = 0
+        self.last_latency = 0.0
+        self.last_bytes = 0
+        self._cond = threading.Condition()
+        # Сохранения идут строго по одному: иначе более старый снимок может
+        # лечь на диск последним, а журнал уже будет очищен
+        self._flush_lock = threading.Lock()
+        self._dirty_since = None
+        self._last_change = None
+        self._journaled = len(journal.pending()) if journal is not None else 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="deck-saver", daemon=True)
+        self._thread.start()
+        if self._journaled:
+            self.request_save()
+
+    def record_slide(self, entry):
+        """Записывает слайд в журнал и планирует сохранение.
+
+        Вызывать под saver.lock вместе с добавлением слайда в презентацию.
+        """
+        if self.journal is not None:
+            with self.lock, self._cond:
+                # Номер слайда в презентации: по нему при восстановлении видно,
+                # попал ли слайд в файл до сбоя
+                entry = dict(entry, position=len(self.presentation.slides))
+                self._journaled = self.journal.append(entry)
+        self.request_save()
+
+    def slide_count(self):
+        return len(self.presentation.slides)
+
+    def request_save(self):
+        now = time.monotonic()
+        with self._cond:
+            if self._dirty_since is None:
+                self._dirty_since = now
+            self._last_change = now
+            self._cond.notify_all()
+
+    def flush(self):
+        """Сохраняет презентацию немедленно в текущем потоке. Возвращает True при успехе.
+
+        Можно вызывать из любого потока: одновременные вызовы выполняются по очереди.
+        """
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._cond:
+            self._dirty_since = None
+        try:
+            started = time.perf_counter()
+            buffer = io.BytesIO()
+            with self.lock:
+                # Слайды, записанные в журнал под этой же блокировкой, уже в презентации
+                with self._cond:
+                    journaled = self._journaled
+                self.presentation.save(buffer)
+            data = buffer.getvalue()
+            atomic_write(self.path, data)
+            self.last_latency = time.perf_counter() - started
+            self.last_bytes = len(data)
+            self.flushes += 1
+            if self.journal is not None and journaled:
+                self.journal.mark_saved(journaled)
+                with self._cond:
+                    self._journaled -= journaled
+            print(f"💾 Сохранено за {self.last_latency * 1000:.0f} мс, {self.last_bytes / 1024:.0f} КБ")
+        except Exception as e:
+            self.failures += 1
+            print(f"Ошибка при сохранении: {e}")
+            # Оставляем изменения несохранёнными — повторим на следующем цикле
+            with self._cond:
+                if self._dirty_since is None:
+                    self._dirty_since = self._last_change = time.monotonic()
+            return False
+        if self.on_saved is not None:
+            try:
+                self.on_saved()
+            except Exception as e:
+                print(f"Ошибка после сохранения: {e}")
+        return True
+
+    def close(self):
+        """Останавливает фоновый поток и делает финальное сохранение."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        return self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._dirty_since is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                now = time.monotonic()
+                deadline = min(self._last_change + self.debounce, self._dirty_since + self.max_delay)
+                if now < deadline:
+                    self._cond.wait(deadline - now)
+                    continue
+            if not self.flush():
+                # Пауза перед повторной попыткой, чтобы не крутиться в цикле
+                time.sleep(self.debounce)
+
+
+class PartedDeck:
+    """Презентация долгой сессии, которая пишется частями.
+
+    Существующий файл path во время работы не открывается: новые слайды
+    попадают в текущую часть (path без .pptx + .partNNN.pptx), и
+    сохраняется только она, поэтому память и время сохранения не растут
+    вместе с презентацией. Часть закрывается, когда в ней max_slides
+    слайдов или её файл больше max_bytes. Каждый слайд сразу пишется в
+    журнал частей; close() один раз доигрывает журнал в основной файл и
+    удаляет части. Слайды из журнала, оставшегося после сбоя, попадут в
+    основной файл при следующем объединении.
+
+    new_part() создаёт пустую презентацию для части, open_base() открывает
+    основной файл, replay(presentation, entry) добавляет слайд из записи
+    журнала. Первая часть создаётся при первом обращении или заранее через
+    prepare(). Интерфейс — как у DeckSaver: lock, presentation (текущая
+    часть), record_slide(), request_save(), close().
+    """
+
+    def __init__(self, path, new_part, open_base, replay, max_slides=50, max_bytes=10 * 1024 * 1024,
+                 debounce=1.0, max_delay=5.0, on_saved=None):
+        self.path = path
+        self.new_part = new_part
+        self.open_base = open_base
+        self.replay = replay
+        self.max_slides = max_slides
+        self.max_bytes = max_bytes
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.on_saved = on_saved
+        self.lock = threading.RLock()
+        self.log = SlideJournal(os.path.splitext(path)[0] + ".parts.jsonl")
+        self.parts = 0
+        self._closed_flushes = 0
+        self._closed_failures = 0
+        self._retiring = []
+        self._slides = len(self.log.pending())
+        if self._slides:
+            print(f"♻️ В журнале частей {self._slides} слайдов от прошлого запуска, "
+                  f"они попадут в {path} при объединении")
+        existing = self.part_paths()
+        self._next_part = int(existing[-1][-8:-5]) + 1 if existing else 1
+        self._part_path = None
+        self._part_slides = 0
+        self._saver = None
+        self._done = False
+
+    def prepare(self):
+        """Создаёт текущую часть, если её ещё нет."""
+        with self.lock:
+            if self._saver is None:
+                self._start_part()
+            return self._saver
+
+    @property
+    def presentation(self):
+        return self.prepare().presentation
+
+    @property
+    def flushes(self):
+        current = self._saver.flushes if self._saver is not None and not self._done else 0
+        return self._closed_flushes + current
+
+    @property
+    def failures(self):
+        current = self._saver.failures if self._saver is not None and not self._done else 0
+        return self._closed_failures + current
+
+    @property
+    def last_latency(self):
+        return self._saver.last_latency if self._saver is not None else 0.0
+
+    @property
+    def last_bytes(self):
+        return self._saver.last_bytes if self._saver is not None else 0
+
+    def slide_count(self):
+        """Слайдов этой сессии (и несобранных прошлых) во всех частях."""
+        with self.lock:
+            if self._saver is None or self._done:
+                return self._slides
+            # Слайд, ещё не записанный в журнал, уже может быть в текущей части
+            return self._slides - self._part_slides + self._saver.slide_count()
+
+    def part_paths(self):
+        base = os.path.splitext(self.path)[0]
+        return sorted(glob.glob(glob.escape(base) + ".part[0-9][0-9][0-9].pptx"))
+
+    def _start_part(self):
+        self._part_path = f"{os.path.splitext(self.path)[0]}.part{self._next_part:03d}.pptx"
+        self._next_part += 1
+        self._part_slides = 0
+        self.parts += 1
+        self._saver = DeckSaver(self.new_part(), self._part_path, self.debounce, self.max_delay,
+                                on_saved=self.on_saved, lock=self.lock)
+        print(f"📄 Новая часть презентации: {self._part_path}")
+
+    def record_slide(self, entry):
+        """Записывает слайд в журнал частей; при превышении лимитов начинает новую часть.
+
+        Вызывать под deck.lock вместе с добавлением слайда в presentation.
+        """
+        with self.lock:
+            saver = self.prepare()
+            self.log.append(entry)
+            self._slides += 1
+            self._part_slides += 1
+            saver.request_save()
+            if self._part_slides >= self.max_slides or saver.last_bytes >= self.max_bytes:
+                self._roll()
+
+    def request_save(self):
+        self.prepare().request_save()
+
+    def flush(self):
+        return self.prepare().flush()
+
+    def _roll(self):
+        # Закрытая часть досохраняется в фоне: её поток ждёт self.lock,
+        # который сейчас держит вызывающий
+        retired = self._saver
+        thread = threading.Thread(target=self._retire, args=(retired,), name="deck-part", daemon=True)
+        self._retiring.append(thread)
+        thread.start()
+        self._start_part()
+
+    def _retire(self, saver):
+        saved = saver.close()
+        with self.lock:
+            self._closed_flushes += saver.flushes
+            self._closed_failures += saver.failures
+        return saved
+
+    def close(self):
+        """Сохраняет последнюю часть и объединяет журнал частей с основным файлом."""
+        for thread in self._retiring:
+            thread.join()
+        saved = self._retire(self._saver) if self._saver is not None else True
+        self._done = True
+        return self.merge() and saved
+
+    def merge(self):
+        """Доигрывает все слайды журнала частей в основной файл и удаляет части."""
+        entries = self.log.pending()
+        if entries:
+            started = time.perf_counter()
+            try:
+                presentation = self.open_base()
+                # Записи, попавшие в основной файл при прерванном объединении, пропускаем
+                self.log.discard_saved(len(presentation.slides))
+                entries = self.log.pending()
+                if entries:
+                    self.log.assign_positions(len(presentation.slides) + 1)
+                    for entry in entries:
+                        self.replay(presentation, entry)
+                    buffer = io.BytesIO()
+                    presentation.save(buffer)
+                    atomic_write(self.path, buffer.getvalue())
+            except Exception as e:
+                print(f"Ошибка при объединении частей, они остаются на диске: {e}")
+                return False
+            self.log.mark_saved(len(entries))
+            print(f"💾 Части объединены в {self.path}: +{len(entries)} слайдов "
+                  f"за {time.perf_counter() - started:.2f}с")
+        for part_path in self.part_paths():
+            os.remove(part_path)
+        return True
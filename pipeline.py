@@ -0,0 +1,259 @@
+import heapq
+import threading
+import time
+from collections import deque
+
+from metrics import tracer
+
+
+class Utterance:
+    """Распознанная фраза. Порядковый номер назначается при выдаче из очереди."""
+
+    def __init__(self, text, captured_at=None, trace_id=None):
+        self.text = text
+        self.captured_at = captured_at if captured_at is not None else time.monotonic()
+        self.trace_id = trace_id
+        self.seq = None
+
+    def age(self):
+        return time.monotonic() - self.captured_at
+
+    def merge(self, other):
+        """Склеивает текст со следующей фразой, сохраняя время первой."""
+        self.text = f"{self.text} {other.text}".strip()
+
+
+class UtteranceQueue:
+    """Ограниченная очередь фраз с политикой переполнения и учётом устаревших.
+
+    overflow:
+      "block" — захват ждёт, пока освободится место;
+      "merge" — новая фраза склеивается с последней в очереди;
+      "drop_oldest" — самая старая фраза выбрасывается.
+    Фразы старше stale_after секунд при выдаче склеиваются со следующей
+    (или выбрасываются при overflow="drop_oldest"), если за ними уже есть
+    более свежие.
+    """
+
+    def __init__(self, maxsize=4, overflow="merge", stale_after=None):
+        if overflow not in ("block", "merge", "drop_oldest"):
+            raise ValueError(f"Неизвестная политика переполнения: {overflow}")
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.stale_after = stale_after
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._next_seq = 0
+        self.put_count = 0
+        self.merged = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put(self, utterance):
+        """Кладёт фразу в очередь. Возвращает False, если очередь закрыта."""
+        with self._cond:
+            if self._closed:
+                return False
+            self.put_count += 1
+            if len(self._items) >= self.maxsize:
+                if self.overflow == "block":
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        return False
+                elif self.overflow == "merge":
+                    self._items[-1].merge(utterance)
+                    self.merged += 1
+                    self._cond.notify_all()
+                    return True
+                else:
+                    self._items.popleft()
+                    self.dropped += 1
+            self._items.append(utterance)
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+            return True
+
+    def get(self):
+        """Выдаёт следующую фразу с порядковым номером; None — очередь закрыта и пуста."""
+        with self._cond:
+            while not self._items and not self._closed:
+                self._cond.wait()
+            if not self._items:
+                return None
+            utterance = self._items.popleft()
+            if self.stale_after is not None:
+                while self._items and utterance.age() > self.stale_after:
+                    if self.overflow == "drop_oldest":
+                        utterance = self._items.popleft()
+                        self.dropped += 1
+                    else:
+                        utterance.merge(self._items.popleft())
+                        self.merged += 1
+            utterance.seq = self._next_seq
+            self._next_seq += 1
+            self._cond.notify_all()
+            return utterance
+
+    def depth(self):
+        with self._cond:
+            return len(self._items)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "max_depth": self.max_depth,
+                "received": self.put_count,
+                "merged": self.merged,
+                "dropped": self.dropped,
+            }
+
+
+class SlidePipeline:
+    """Конвейер «захват → генерация → запись».
+
+    capture() вызывается в отдельном потоке и возвращает текст фразы
+    (пустая строка — ничего не распознано, None — источник закончился). is_stop(text) решает, пора ли
+    завершаться. generate(text) выполняется в workers потоках, а
+    write(utterance, result) — в единственном потоке-писателе строго в
+    порядке фраз, поэтому только он должен трогать презентацию.
+
+    После ошибки захвата следующая попытка откладывается (capture_backoff
+    секунд, вдвое больше после каждой ошибки подряд, но не больше
+    max_backoff). После max_capture_failures ошибок подряд, а также при
+    ImportError (нет библиотеки или драйвера звука) конвейер
+    останавливается, а ошибка сохраняется в capture_error.
+    """
+
+    def __init__(self, capture, generate, write, is_stop=None, workers=2,
+                 queue_size=4, overflow="merge", stale_after=None,
+                 max_capture_failures=5, capture_backoff=0.5, max_backoff=5.0):
+        self.capture = capture
+        self.generate = generate
+        self.write = write
+        self.is_stop = is_stop or (lambda text: False)
+        self.queue = UtteranceQueue(queue_size, overflow, stale_after)
+        self.max_capture_failures = max_capture_failures
+        self.capture_backoff = capture_backoff
+        self.max_backoff = max_backoff
+        self.capture_error = None
+        self._workers = workers
+        self._results = []
+        self._results_cond = threading.Condition()
+        self._active_workers = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        capture_thread = threading.Thread(target=self._capture_loop, name="capture", daemon=True)
+        capture_thread.start()
+        self._active_workers = self._workers
+        for i in range(self._workers):
+            worker = threading.Thread(target=self._generate_loop, name=f"generate-{i}", daemon=True)
+            worker.start()
+            self._threads.append(worker)
+        writer = threading.Thread(target=self._write_loop, name="writer", daemon=True)
+        writer.start()
+        self._threads.append(writer)
+        return self
+
+    def submit(self, text):
+        """Добавляет фразу в очередь в обход захвата (например, из файла)."""
+        return self.queue.put(Utterance(text))
+
+    def stop(self):
+        """Прекращает приём новых фраз; уже принятые будут дописаны."""
+        self._stop.set()
+        self.queue.close()
+
+    def join(self, timeout=None):
+        """Ждёт завершения генерации и записи. Возвращает True, если всё завершено."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            thread.join(remaining)
+            if thread.is_alive():
+                return False
+        return True
+
+    def stopped(self):
+        return self._stop.is_set()
+
+    def _capture_loop(self):
+        failures = 0
+        while not self._stop.is_set():
+            trace_id = tracer.new_trace()
+            try:
+                text = self.capture()
+            except Exception as e:
+                failures += 1
+                print(f"Ошибка захвата речи: {e}")
+                if isinstance(e, ImportError) or failures >= self.max_capture_failures:
+                    self.capture_error = e
+                    print(f"⛔ Захват речи остановлен после ошибок подряд: {failures}")
+                    self.stop()
+                    break
+                # Пауза перед повтором, чтобы неисправное устройство не грузило процессор
+                self._stop.wait(min(self.max_backoff, self.capture_backoff * 2 ** (failures - 1)))
+                continue
+            failures = 0
+            if text is None:
+                # Источник звука закончился (например, WAV-файл)
+                self.stop()
+                break
+            text = text.strip()
+            if not text:
+                continue
+            if self.is_stop(text):
+                self.stop()
+                break
+            self.queue.put(Utterance(text, trace_id=trace_id))
+            print(f"📥 Фраза в очереди, глубина очереди: {self.queue.depth()}")
+
+    def _generate_loop(self):
+        try:
+            while True:
+                utterance = self.queue.get()
+                if utterance is None:
+                    break
+                tracer.set_current(utterance.trace_id)
+                tracer.observe("queue_wait", utterance.age(), depth=self.queue.depth())
+                try:
+                    with tracer.span("generate"):
+                        result = self.generate(utterance.text)
+                except Exception as e:
+                    print(f"Ошибка генерации слайда: {e}")
+                    result = None
+                with self._results_cond:
+                    heapq.heappush(self._results, (utterance.seq, id(utterance), utterance, result))
+                    self._results_cond.notify_all()
+        finally:
+            with self._results_cond:
+                self._active_workers -= 1
+                self._results_cond.notify_all()
+
+    def _write_loop(self):
+        next_seq = 0
+        while True:
+            with self._results_cond:
+                while not (self._results and self._results[0][0] == next_seq):
+                    if self._active_workers == 0 and not self._results:
+                        return
+                    self._results_cond.wait()
+                _, _, utterance, result = heapq.heappop(self._results)
+            next_seq += 1
+            if result is None:
+                continue
+            tracer.set_current(utterance.trace_id)
+            try:
+                with tracer.span("write"):
+                    self.write(utterance, result)
+            except Exception as e:
+                print(f"Ошибка записи слайда: {e}")
@@ -0,0 +1,183 @@
+"""Живой предпросмотр слайдов в браузере вместо перезапуска PowerPoint.
+
+Сервер отрисовывает в HTML только что добавленный слайд и рассылает его
+открытым страницам через server-sent events, поэтому задержка показа не
+зависит от размера презентации. Работает на любой ОС: откройте
+http://127.0.0.1:8765/ в браузере на проекторе.
+"""
+import html
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from theme import contrast_text_color
+
+PAGE = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>Презентация</title>
+<style>
+  html, body { margin: 0; height: 100%; background: #222; }
+  #stage { display: flex; align-items: center; justify-content: center; height: 100%; }
+  .slide { width: min(100vw, 177.78vh); height: min(56.25vw, 100vh); box-sizing: border-box;
+           padding: 5% 7%; display: flex; flex-direction: column; }
+  .slide h1 { font-size: 5.5vmin; margin: 0 0 6%; text-align: center; font-weight: 400; }
+  .slide ul { font-size: 3.6vmin; line-height: 1.5; margin: 0; }
+  #status { position: fixed; bottom: 8px; right: 12px; color: #888; font: 12px sans-serif; }
+</style>
+</head>
+<body>
+<div id="stage"><div class="slide"><h1>Ожидание первого слайда…</h1></div></div>
+<div id="status"></div>
+<script>
+  const source = new EventSource("events");
+  source.onmessage = (event) => {
+    const data = JSON.parse(event.data);
+    document.getElementById("stage").innerHTML = data.html;
+    document.getElementById("status").textContent = "слайд " + data.index;
+  };
+  source.onerror = () => { document.getElementById("status").textContent = "нет соединения…"; };
+</script>
+</body>
+</html>
+"""
+
+
+def _css_color(color):
+    return f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
+
+
+def render_slide_html(title, content, design=None):
+    """HTML одного слайда: тот же заголовок, пункты, фон и шрифты, что и в .pptx.
+
+    design — словарь дизайна слайда или темы; None — оформление по умолчанию.
+    """
+    design = design or {}
+    main_color = design.get('main_color') or (240, 240, 240)
+    accent_color = design.get('accent_color') or (0, 0, 0)
+    text_color = contrast_text_color(main_color)
+    title_font = html.escape(design.get('title_font') or "sans-serif", quote=True)
+    text_font = html.escape(design.get('text_font') or "sans-serif", quote=True)
+    items = "".join(f"<li>{html.escape(line[:100])}</li>" for line in content[:3])
+    return (
+        f'<div class="slide" style="background:{_css_color(main_color)}">'
+        f'<h1 style="color:{_css_color(accent_color)};font-family:\'{title_font}\'">'
+        f'{html.escape(title[:50])}</h1>'
+        f'<ul style="color:{_css_color(text_color)};font-family:\'{text_font}\'">{items}</ul>'
+        f'</div>'
+    )
+
+
+class SlideBroadcaster:
+    """Рассылает слайды подписчикам (открытым страницам) и помнит последний."""
+
+    def __init__(self):
+        self._clients = []
+        self._lock = threading.Lock()
+        self._latest = None
+        self.published = 0
+
+    def publish(self, index, slide_html):
+        """Рассылает слайд всем подключённым браузерам."""
+        message = json.dumps({"index": index, "html": slide_html}, ensure_ascii=False)
+        with self._lock:
+            self._latest = message
+            self.published += 1
+            clients = list(self._clients)
+        for client in clients:
+            client.put(message)
+
+    def subscribe(self):
+        """Новый подписчик сразу получает текущий слайд."""
+        client = queue.Queue()
+        with self._lock:
+            self._clients.append(client)
+            if self._latest is not None:
+                client.put(self._latest)
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.remove(client)
+
+    def close(self):
+        """Завершает потоки событий всех подписчиков."""
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.put(None)
+
+
+def stream_events(handler, broadcaster):
+    """Отдаёт слайды в ответ на GET как server-sent events, пока клиент подключён."""
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/event-stream; charset=utf-8")
+    handler.send_header("Cache-Control", "no-cache")
+    handler.end_headers()
+    client = broadcaster.subscribe()
+    try:
+        while True:
+            try:
+                message = client.get(timeout=15)
+            except queue.Empty:
+                handler.wfile.write(b": ping\n\n")
+                handler.wfile.flush()
+                continue
+            if message is None:
+                break
+            handler.wfile.write(f"data: {message}\n\n".encode("utf-8"))
+            handler.wfile.flush()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        broadcaster.unsubscribe(client)
+
+
+def send_page(handler, page=PAGE):
+    data = page.encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/html; charset=utf-8")
+    handler.send_header("Content-Length", str(len(data)))
+    handler.end_headers()
+    handler.wfile.write(data)
+
+
+class PreviewServer:
+    """HTTP-сервер предпросмотра: / — страница, /events — поток слайдов (SSE)."""
+
+    def __init__(self, port=8765, host="127.0.0.1"):
+        self.broadcaster = SlideBroadcaster()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}/"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="preview", daemon=True).start()
+        return self
+
+    def publish(self, index, slide_html):
+        self.broadcaster.publish(index, slide_html)
+
+    def close(self):
+        self.broadcaster.close()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        broadcaster = self.broadcaster
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/":
+                    send_page(self)
+                elif self.path == "/events":
+                    stream_events(self, broadcaster)
+                else:
+                    self.send_error(404)
+
+        return Handler
@@ -0,0 +1,56 @@
+import threading
+
+from metrics import tracer
+
+
+class PromptReuse:
+    """Сколько промпта запросов одного вида Ollama взяла из своего кэша.
+
+    Ollama не вычисляет заново начало промпта, совпадающее с уже
+    вычисленным (KV-кэш общего префикса), и сообщает в prompt_eval_count
+    только вычисленные токены. Поэтому промпты построены так, что
+    неизменные инструкции идут первыми, а текст докладчика — в конце.
+    Длину полного промпта в токенах клиент не знает: она оценивается по
+    числу символов и наибольшей замеченной плотности токенов на символ
+    (её даёт запрос, вычисленный целиком), а время одного токена — по
+    тому же запросу.
+    """
+
+    # Меньшие расхождения — погрешность оценки, а не попадание в кэш
+    MIN_REUSED_SHARE = 0.2
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.requests = 0
+        self.reused = 0  # запросов с попаданием в кэш
+        self.reused_tokens = 0
+        self.saved_seconds = 0.0
+        self._tokens_per_char = None
+        self._seconds_per_token = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, prompt, data):
+        """Учитывает ответ Ollama на prompt. Возвращает (токенов из кэша, сэкономленные секунды)."""
+        count = data.get("prompt_eval_count")
+        duration = data.get("prompt_eval_duration")
+        if not count or not prompt:
+            return 0, 0.0
+        density = count / len(prompt)
+        with self._lock:
+            self.requests += 1
+            if self._tokens_per_char is None or density >= self._tokens_per_char:
+                # Самый «плотный» запрос ближе всего к вычислению промпта целиком
+                self._tokens_per_char = density
+                if duration:
+                    self._seconds_per_token = duration / 1e9 / count
+                return 0, 0.0
+            expected = len(prompt) * self._tokens_per_char
+            reused = int(expected - count)
+            if reused < expected * self.MIN_REUSED_SHARE:
+                return 0, 0.0
+            saved = reused * self._seconds_per_token
+            self.reused += 1
+            self.reused_tokens += reused
+            self.saved_seconds += saved
+        tracer.observe("prompt_eval_saved", saved, kind=self.kind, reused_tokens=reused)
+        return reused, saved
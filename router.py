@@ -0,0 +1,135 @@
+import json
+import re
+import threading
+from collections import deque
+
+# Окончания, которые отбрасываются при нормализации слов (длинные — первыми)
+_ENDINGS = sorted([
+    "иями", "иям", "ием", "ии", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ией",
+    "иях", "ях", "ах", "ых", "их", "ые", "ие", "ым", "им", "ой", "ей", "ий", "ый", "ая", "яя",
+    "ое", "ее", "ую", "юю", "ам", "ям", "ом", "ем", "ов", "ев", "ью", "ия", "ию",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+], key=len, reverse=True)
+_MIN_STEM = 3
+_WORD_RE = re.compile(r"[0-9a-zа-яё]+")
+
+
+def stem(word):
+    """Грубо приводит русское слово к основе, отбрасывая окончание."""
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def normalize(text):
+    """Разбивает текст на основы слов: нижний регистр, ё → е, без окончаний."""
+    return [stem(word) for word in _WORD_RE.findall(text.lower().replace("ё", "е"))]
+
+
+class KeywordRouter:
+    """Быстрый выбор готового слайда из config.json по ключевым фразам.
+
+    Ключевые фразы всех разделов собираются в автомат Ахо — Корасик над
+    основами слов, поэтому поиск линеен по длине фразы докладчика и не
+    зависит от числа разделов, а разные формы слова («нейронных сетях»,
+    «нейронные сети») совпадают.
+
+    Одно случайное упоминание темы не считается попаданием: у раздела
+    должно совпасть не меньше min_matches ключевых фраз, либо они должны
+    покрывать не меньше min_coverage слов фразы. Один и тот же раздел не
+    отдаётся два раза подряд.
+    """
+
+    def __init__(self, sections, min_matches=2, min_coverage=0.5):
+        self.sections = sections
+        self.min_matches = min_matches
+        self.min_coverage = min_coverage
+        self.lookups = 0
+        self.hits = 0
+        self._last_index = None  # раздел, отданный на предыдущую фразу
+        self._lock = threading.Lock()
+        # Автомат: переходы, ссылки неудач и выходы (номера разделов)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for index, section in enumerate(sections):
+            for keyword in section.get("keywords", []):
+                tokens = normalize(keyword)
+                if tokens:
+                    self._add(tokens, index)
+        self._build()
+
+    @classmethod
+    def from_config(cls, path, min_matches=2, min_coverage=0.5):
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(config.get("sections", []), min_matches, min_coverage)
+
+    def _add(self, tokens, section_index):
+        state = 0
+        for token in tokens:
+            nxt = self._goto[state].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append((section_index, len(tokens)))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                if state == 0:
+                    continue  # Для детей корня ссылка неудачи — корень
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(token, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def match(self, text):
+        """Возвращает раздел, уверенно подходящий к фразе, или None.
+
+        Раздел считается подходящим, если у него строго больше совпавших
+        ключевых фраз, чем у любого другого, и либо их не меньше
+        min_matches, либо они покрывают не меньше min_coverage слов фразы.
+        """
+        counts = {}
+        covered = {}  # раздел → номера слов фразы, попавших в его ключевые фразы
+        tokens = normalize(text)
+        state = 0
+        for position, token in enumerate(tokens):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for section_index, length in self._output[state]:
+                counts[section_index] = counts.get(section_index, 0) + 1
+                covered.setdefault(section_index, set()).update(range(position - length + 1, position + 1))
+
+        best = None
+        if counts:
+            ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+            index, score = ranked[0]
+            runner_up = ranked[1][1] if len(ranked) > 1 else 0
+            coverage = len(covered[index]) / len(tokens)
+            if score > runner_up and (score >= self.min_matches or coverage >= self.min_coverage):
+                best = index
+
+        with self._lock:
+            self.lookups += 1
+            if best is not None and best == self._last_index:
+                # Тот же готовый слайд подряд не нужен — пусть слайд сделает модель
+                best = None
+            self._last_index = best
+            if best is not None:
+                self.hits += 1
+        return self.sections[best] if best is not None else None
+
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
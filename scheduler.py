@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from metrics import tracer
+
+
+class QueueFull(Exception):
+    """Очередь сессии (или всего сервиса) заполнена — клиенту стоит повторить позже."""
+
+
+class Job:
+    """Задача сессии: время ожидания в очереди и время выполнения считаются отдельно."""
+
+    def __init__(self, session_id, func, args):
+        self.session_id = session_id
+        self.func = func
+        self.args = args
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+    def wait_seconds(self):
+        return (self.started_at or time.monotonic()) - self.submitted_at
+
+    def run_seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+class _SessionQueue:
+    def __init__(self):
+        self.pending = deque()
+        self.running = False
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.run_total = 0.0
+
+
+class FairScheduler:
+    """Общие потоки генерации для многих сессий с честной очередью.
+
+    workers ограничивает число одновременно генерируемых слайдов (а значит
+    и запросов к Ollama). Сессии обслуживаются по кругу: следующей получает
+    поток та, что дольше всех ждала своей очереди, поэтому шумная комната
+    не задерживает остальные. У каждой сессии не больше одной задачи в
+    работе — слайды одной сессии идут строго по порядку. При переполнении
+    очереди сессии (session_queue_size) или всего сервиса (max_pending)
+    submit() выбрасывает QueueFull.
+    """
+
+    def __init__(self, workers=4, session_queue_size=4, max_pending=64):
+        self.session_queue_size = session_queue_size
+        self.max_pending = max_pending
+        self._sessions = {}
+        self._ready = deque()  # сессии с задачами, ожидающие свободного потока
+        self._pending = 0
+        self._running = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"scheduler-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, session_id, func, *args):
+        """Ставит func(*args) в очередь сессии. Возвращает Future с результатом."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Планировщик остановлен")
+            queue = self._sessions.setdefault(session_id, _SessionQueue())
+            if len(queue.pending) >= self.session_queue_size or self._pending >= self.max_pending:
+                queue.rejected += 1
+                raise QueueFull(f"очередь сессии {session_id}: {len(queue.pending)}, "
+                                f"всего ожидает {self._pending}")
+            job = Job(session_id, func, args)
+            queue.pending.append(job)
+            self._pending += 1
+            if not queue.running and len(queue.pending) == 1:
+                self._ready.append(session_id)
+            self._cond.notify_all()
+            return job.future
+
+    def drain(self, session_id, timeout=None):
+        """Ждёт, пока у сессии не останется задач. Возвращает True, если дождались."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                queue = self._sessions.get(session_id)
+                if queue is None or (not queue.pending and not queue.running):
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+
+    def forget(self, session_id):
+        """Удаляет статистику закрытой сессии (её очередь должна быть пуста)."""
+        with self._cond:
+            self._sessions.pop(session_id, None)
+
+    def session_stats(self, session_id):
+        with self._cond:
+            queue = self._sessions.get(session_id)
+            if queue is None:
+                return {"pending": 0, "running": False, "completed": 0, "rejected": 0,
+                        "avg_wait_seconds": 0.0, "avg_run_seconds": 0.0}
+            done = queue.completed or 1
+            return {
+                "pending": len(queue.pending),
+                "running": queue.running,
+                "completed": queue.completed,
+                "rejected": queue.rejected,
+                "avg_wait_seconds": round(queue.wait_total / done, 3),
+                "avg_run_seconds": round(queue.run_total / done, 3),
+            }
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": len(self._threads),
+                "running": self._running,
+                "pending": self._pending,
+                "sessions": len(self._sessions),
+            }
+
+    def close(self):
+        """Останавливает потоки; задачи, ещё не начатые, отменяются."""
+        with self._cond:
+            self._closed = True
+            for queue in self._sessions.values():
+                while queue.pending:
+                    queue.pending.popleft().future.cancel()
+            self._pending = 0
+            self._ready.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _next_job(self):
+        with self._cond:
+            while not self._ready and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            queue = self._sessions[self._ready.popleft()]
+            job = queue.pending.popleft()
+            queue.running = True
+            self._pending -= 1
+            self._running += 1
+            job.started_at = time.monotonic()
+            return job
+
+    def _finish(self, job):
+        with self._cond:
+            job.finished_at = time.monotonic()
+            self._running -= 1
+            queue = self._sessions.get(job.session_id)
+            if queue is not None:
+                queue.running = False
+                queue.completed += 1
+                queue.wait_total += job.wait_seconds()
+                queue.run_total += job.run_seconds()
+                if queue.pending:
+                    # Сессия встаёт в конец круга
+                    self._ready.append(job.session_id)
+            self._cond.notify_all()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            tracer.observe("scheduler_wait", job.wait_seconds(), session=job.session_id)
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(job.func(*job.args))
+                except BaseException as e:
+                    job.future.set_exception(e)
+            self._finish(job)
+            tracer.observe("scheduler_run", job.run_seconds(), session=job.session_id)
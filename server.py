@@ -0,0 +1,385 @@
+"""HTTP-сервис генерации презентаций для нескольких докладчиков одновременно.
+
+У каждой сессии (зала) своя презентация; фразы приходят текстом или
+звуком, а запросы к Ollama всех сессий идут через общий пул соединений и
+общий планировщик с честной очередью; каждый запрос уходит на наименее
+загруженный сервер (см. endpoints.EndpointPool). Пример:
+    python server.py --port 8080 --workers 4 \
+        --endpoint http://gpu1:11434/api/generate --endpoint http://gpu2:11434/api/generate
+
+API:
+    POST   /sessions                    создать сессию → {"id": ...}
+    POST   /sessions/<id>/text          {"text": "..."} → 202, или 429 при переполнении очереди
+    POST   /sessions/<id>/audio?rate=16000   тело — 16-битный моно PCM; фразы выделяются по паузам
+    GET    /sessions/<id>               статистика: ожидание в очереди и время генерации
+    GET    /sessions/<id>/              страница живого предпросмотра
+    GET    /sessions/<id>/events        слайды (server-sent events)
+    GET    /sessions/<id>/deck.pptx     текущая презентация
+    DELETE /sessions/<id>               дописать очередь, сохранить и закрыть
+    GET    /stats                       общая статистика сервиса
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from pptx import Presentation
+
+import main
+from capture import CaptureEngine, ChunkSource
+from metrics import tracer
+from persistence import DeckSaver, SlideJournal
+from preview import SlideBroadcaster, render_slide_html, send_page, stream_events
+from scheduler import FairScheduler, QueueFull
+from theme import apply_deck_theme
+
+
+class Session:
+    """Презентация одного зала: генерация идёт через общий планировщик."""
+
+    def __init__(self, service, session_id, path):
+        self.service = service
+        self.id = session_id
+        self.path = path
+        self.created_at = time.time()
+        self.presentation = Presentation()
+        self.saver = DeckSaver(self.presentation, path, debounce=main.SAVE_DEBOUNCE_SECONDS,
+                               max_delay=main.SAVE_MAX_DELAY_SECONDS,
+                               journal=SlideJournal(path + ".journal"))
+        self.broadcaster = SlideBroadcaster()
+        self.slides = 0
+        self.generation_total = 0.0
+        self.render_total = 0.0
+        self._theme_design = None
+        self._theme_needed = main.DECK_THEME_ENABLED
+        self._audio_lock = threading.Lock()
+        self._audio_source = None
+        self._audio_thread = None
+        self._carry = ""  # фраза, не принятая из-за переполнения очереди
+
+    def submit_text(self, text):
+        """Ставит фразу в очередь. Выбрасывает QueueFull, если сессия перегружена."""
+        return self.service.scheduler.submit(self.id, self._make_slide, text)
+
+    def feed_audio(self, pcm, sample_rate):
+        """Дописывает кусок звука. Возвращает False, если буфер распознавания переполнен."""
+        with self._audio_lock:
+            if self._audio_source is None:
+                self._audio_source = ChunkSource(sample_rate)
+                engine = CaptureEngine(self._audio_source, pause_ms=main.PAUSE_MS,
+                                       recalibrate_every=main.RECALIBRATE_SECONDS)
+                self._audio_thread = threading.Thread(target=self._listen, args=(engine,),
+                                                      name=f"audio-{self.id}", daemon=True)
+                self._audio_thread.start()
+            elif self._audio_source.sample_rate != sample_rate:
+                raise ValueError("частота дискретизации не может меняться внутри сессии")
+            return self._audio_source.feed(pcm)
+
+    def _listen(self, engine):
+        backend = self.service.asr_backend()
+        while True:
+            stream = backend.open_stream(engine.sample_rate)
+            segment = engine.next_segment(stream)
+            if segment is None:
+                break
+            try:
+                text = stream.finish().strip()
+            except Exception as e:
+                print(f"[{self.id}] Ошибка распознавания: {e}")
+                continue
+            if not text:
+                continue
+            text = f"{self._carry} {text}".strip()
+            try:
+                self.submit_text(text)
+                self._carry = ""
+            except QueueFull:
+                # Как PIPELINE_OVERFLOW="merge": фраза склеится со следующей
+                self._carry = text
+        engine.close()
+
+    def _make_slide(self, text):
+        timings = {}
+        for_theme = self._theme_needed
+        self._theme_needed = False
+        title, content, design_suggestions = main.generate_slide_data(
+            text, timings, with_design=for_theme or not main.DECK_THEME_ENABLED,
+            client=self.service.client)
+        if for_theme and isinstance(design_suggestions, main.Placeholder):
+            # Дизайн не получен — тему запросит следующий слайд
+            self._theme_needed = True
+            for_theme = False
+        elif for_theme:
+            self._theme_design = main.resolve_design(design_suggestions)
+        if main.DECK_THEME_ENABLED:
+            design_suggestions = None
+
+        started = time.perf_counter()
+        with self.saver.lock:
+            if for_theme:
+                apply_deck_theme(self.presentation, self._theme_design)
+            main.create_slide(self.presentation, title, content, design_suggestions)
+            self.slides = len(self.presentation.slides)
+            self.saver.record_slide(main.slide_to_journal(title, content, design_suggestions))
+        design = self._theme_design if design_suggestions is None else main.resolve_design(design_suggestions)
+        self.broadcaster.publish(self.slides, render_slide_html(title, content, design))
+        self.generation_total += timings.get("total", 0.0)
+        self.render_total += time.perf_counter() - started
+        return {"index": self.slides, "title": title, "content": content}
+
+    def stats(self):
+        stats = self.service.scheduler.session_stats(self.id)
+        done = self.slides or 1
+        stats.update({
+            "id": self.id,
+            "slides": self.slides,
+            "avg_generation_seconds": round(self.generation_total / done, 3),
+            "avg_render_seconds": round(self.render_total / done, 3),
+            "audio_buffered_seconds": round(self._audio_source.buffered_seconds(), 2)
+            if self._audio_source is not None else 0.0,
+        })
+        return stats
+
+    def close(self, timeout=120):
+        """Дописывает принятые фразы, сохраняет презентацию и закрывает сессию."""
+        if self._audio_source is not None:
+            self._audio_source.close()
+            self._audio_thread.join(timeout)
+        self.service.scheduler.drain(self.id, timeout)
+        self.service.scheduler.forget(self.id)
+        self.broadcaster.close()
+        return self.saver.close()
+
+
+class SlideService:
+    """Сессии, общий планировщик и распределение запросов по серверам Ollama."""
+
+    def __init__(self, output_dir, endpoints, workers=4, session_queue_size=4,
+                 max_pending=64, max_sessions=32):
+        self.output_dir = output_dir
+        self.endpoints = endpoints
+        self.max_sessions = max_sessions
+        self.scheduler = FairScheduler(workers, session_queue_size, max_pending)
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self._asr = None
+        os.makedirs(output_dir, exist_ok=True)
+        # Общие для всех сессий соединения; на каждый слайд — до двух
+        # параллельных запросов (контент и дизайн)
+        self.client = main.OllamaClient(endpoints, workers=workers * 2)
+
+    def asr_backend(self):
+        """Общий движок распознавания (создаётся при первой звуковой сессии)."""
+        from asr import create_backend
+        with self._lock:
+            if self._asr is None:
+                self._asr = create_backend(main.ASR_BACKEND, main.VOSK_MODEL_PATH)
+            return self._asr
+
+    def create_session(self):
+        with self._lock:
+            if len(self.sessions) >= self.max_sessions:
+                raise QueueFull(f"открыто сессий: {len(self.sessions)}")
+            session_id = uuid.uuid4().hex[:8]
+            session = Session(self, session_id, os.path.join(self.output_dir, f"{session_id}.pptx"))
+            self.sessions[session_id] = session
+        print(f"🟢 Сессия {session_id}: {session.path}")
+        return session
+
+    def close_session(self, session_id):
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.close()
+        print(f"💾 Сессия {session_id} закрыта: {session.slides} слайдов в {session.path}")
+        return True
+
+    def stats(self):
+        stats = self.scheduler.stats()
+        with self._lock:
+            sessions = list(self.sessions.values())
+        stats["sessions"] = [session.stats() for session in sessions]
+        stats["ollama"] = self.client.endpoints.stats()
+        stats["prompt_reuse"] = {kind: {"requests": reuse.requests, "reused": reuse.reused,
+                                        "saved_seconds": round(reuse.saved_seconds, 3)}
+                                 for kind, reuse in list(self.client.prompt_reuse.items())}
+        return stats
+
+    def close(self):
+        for session_id in list(self.sessions):
+            self.close_session(session_id)
+        self.scheduler.close()
+        self.client.close()
+
+
+def _send_json(handler, status, data, headers=None):
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json; charset=utf-8")
+    handler.send_header("Content-Length", str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _route(self):
+            """Разбирает путь: (сессия или None, остаток пути, параметры запроса)."""
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")
+            query = parse_qs(url.query)
+            if parts[0] != "sessions" or len(parts) < 2:
+                return None, url.path, query
+            session = service.sessions.get(parts[1])
+            rest = "/".join(parts[2:])
+            if url.path.endswith("/") and not rest:
+                rest = "/"
+            return session, rest, query
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length", 0))
+            return self.rfile.read(length) if length else b""
+
+        def _session_or_404(self, session):
+            if session is None:
+                _send_json(self, 404, {"error": "сессия не найдена"})
+                return False
+            return True
+
+        def do_GET(self):
+            if self.path == "/stats":
+                _send_json(self, 200, service.stats())
+                return
+            session, rest, _ = self._route()
+            if not self._session_or_404(session):
+                return
+            if rest == "":
+                _send_json(self, 200, session.stats())
+            elif rest == "/":
+                send_page(self)
+            elif rest == "events":
+                self.close_connection = True
+                stream_events(self, session.broadcaster)
+            elif rest == "deck.pptx":
+                session.saver.flush()
+                with open(session.path, "rb") as f:
+                    data = f.read()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/vnd.openxmlformats-officedocument"
+                                                 ".presentationml.presentation")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            body = self._body()
+            if self.path == "/sessions":
+                try:
+                    session = service.create_session()
+                except QueueFull as e:
+                    _send_json(self, 503, {"error": str(e)}, {"Retry-After": "30"})
+                    return
+                _send_json(self, 201, {"id": session.id, "preview": f"/sessions/{session.id}/"})
+                return
+            session, rest, query = self._route()
+            if not self._session_or_404(session):
+                return
+            if rest == "text":
+                try:
+                    text = json.loads(body or b"{}").get("text", "").strip()
+                except ValueError:
+                    _send_json(self, 400, {"error": "ожидается JSON с полем text"})
+                    return
+                if not text:
+                    _send_json(self, 400, {"error": "пустой текст"})
+                    return
+                try:
+                    session.submit_text(text)
+                except QueueFull as e:
+                    _send_json(self, 429, {"error": str(e)}, {"Retry-After": "2"})
+                    return
+                _send_json(self, 202, session.stats())
+            elif rest == "audio":
+                try:
+                    rate = int(query.get("rate", ["16000"])[0])
+                    accepted = session.feed_audio(body, rate)
+                except (ValueError, RuntimeError) as e:
+                    _send_json(self, 400, {"error": str(e)})
+                    return
+                if not accepted:
+                    _send_json(self, 429, {"error": "буфер распознавания переполнен"},
+                               {"Retry-After": "1"})
+                    return
+                _send_json(self, 202, {"buffered_seconds": session.stats()["audio_buffered_seconds"]})
+            else:
+                self.send_error(404)
+
+        def do_DELETE(self):
+            session, rest, _ = self._route()
+            if not self._session_or_404(session):
+                return
+            if rest:
+                self.send_error(404)
+                return
+            stats = session.stats()
+            service.close_session(session.id)
+            _send_json(self, 200, stats)
+
+    return Handler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Сервис презентаций для нескольких докладчиков")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--output-dir", default="sessions", help="куда сохранять презентации сессий")
+    parser.add_argument("--endpoint", action="append",
+                        help="URL /api/generate сервера Ollama (можно указать несколько раз)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="сколько слайдов генерируется одновременно на весь сервис")
+    parser.add_argument("--session-queue", type=int, default=4,
+                        help="сколько фраз может ждать в очереди одной сессии")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="сколько фраз может ждать во всех очередях вместе")
+    parser.add_argument("--max-sessions", type=int, default=32)
+    parser.add_argument("--trace", action="store_true",
+                        help=f"писать трассы в {main.TRACE_FILE} и отдавать /metrics на порту {main.METRICS_PORT}")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    endpoints = args.endpoint or [main.OLLAMA_URL]
+    if not any([main.check_ollama(url) for url in endpoints]):
+        raise SystemExit(1)
+    if args.trace:
+        tracer.configure(True, main.TRACE_FILE)
+        tracer.serve(main.METRICS_PORT)
+    service = SlideService(args.output_dir, endpoints, args.workers, args.session_queue,
+                           args.max_pending, args.max_sessions)
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    httpd.daemon_threads = True
+    print(f"🟢 Сервис: http://{args.host}:{args.port}/ (серверов Ollama: {len(endpoints)}, "
+          f"одновременно слайдов: {args.workers})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nПрервано пользователем")
+    finally:
+        httpd.server_close()
+        service.close()
+        tracer.close()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# Модули проекта лежат в корне репозитория, рядом с main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ollama_stub import start_stub  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    """Запускает замену Ollama; возвращает функцию, принимающую настройки StubSettings."""
+    servers = []
+
+    def start(**settings):
+        server, url = start_stub(**settings)
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
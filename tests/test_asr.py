@@ -0,0 +1,64 @@
+import pytest
+
+import asr
+import main
+
+
+class FakeEngine:
+    def __init__(self, fail_calibration=False):
+        self.fail_calibration = fail_calibration
+        self.closed = False
+
+    def calibrate(self):
+        if self.fail_calibration:
+            raise OSError("устройство занято")
+
+    def close(self):
+        self.closed = True
+
+
+class LocalBackend(asr.ASRBackend):
+    name = "local"
+
+    def open_stream(self, sample_rate):
+        raise NotImplementedError
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        asr.ASRBackend()
+
+
+def test_failing_backend_is_an_error_before_audio_is_opened(monkeypatch):
+    opened = []
+    monkeypatch.setattr(main, "ASR_BACKEND", "vosk")
+    monkeypatch.setattr(main, "VOSK_MODEL_PATH", "нет/такой/модели")
+    monkeypatch.setattr(main, "open_capture_engine", lambda: opened.append(True))
+    with pytest.raises(Exception):
+        main.open_capture()
+    assert opened == []
+
+
+def test_google_falls_back_to_single_phrases_and_closes_engine(monkeypatch):
+    engine = FakeEngine(fail_calibration=True)
+    monkeypatch.setattr(main, "ASR_BACKEND", "google")
+    monkeypatch.setattr(main, "open_capture_engine", lambda: engine)
+    assert main.open_capture() == (None, main.recognize_speech)
+    assert engine.closed
+
+
+def test_local_backend_does_not_fall_back_to_google(monkeypatch):
+    engine = FakeEngine(fail_calibration=True)
+    monkeypatch.setattr(main, "create_backend", lambda name, model_path: LocalBackend())
+    monkeypatch.setattr(main, "open_capture_engine", lambda: engine)
+    with pytest.raises(RuntimeError):
+        main.open_capture()
+    assert engine.closed
+
+
+def test_engine_capture_is_used_when_audio_opens(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr(main, "ASR_BACKEND", "google")
+    monkeypatch.setattr(main, "open_capture_engine", lambda: engine)
+    opened, capture = main.open_capture()
+    assert opened is engine and capture is not main.recognize_speech
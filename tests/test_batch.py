@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+from pptx import Presentation
+
+import batch
+import main
+
+UTTERANCES = ["про нейронные сети", "про машинное обучение", "про компьютерное зрение"]
+
+
+@pytest.fixture
+def output(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "CACHE_ENABLED", False)
+    return str(tmp_path / "lecture.pptx")
+
+
+def checkpoint(output):
+    path = output + ".checkpoint.jsonl"
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_read_transcript(tmp_path):
+    text = tmp_path / "lecture.txt"
+    text.write_text("Первая\nфраза\n\nВторая фраза\n", encoding="utf-8")
+    assert batch.read_transcript(str(text)) == ["Первая фраза", "Вторая фраза"]
+    lines = tmp_path / "lecture.jsonl"
+    lines.write_text('"Первая"\n{"text": "Вторая"}\n{сломано\n', encoding="utf-8")
+    assert batch.read_transcript(str(lines)) == ["Первая", "Вторая"]
+
+
+def test_build_deck(stub, output):
+    batch.build_deck(UTTERANCES, output, [stub()], workers=2)
+    slides = Presentation(output).slides
+    assert len(slides) == 3
+    assert checkpoint(output) is None
+
+
+def test_placeholder_slide_is_retried(stub, output, monkeypatch):
+    generate = main.generate_slide_data
+    calls = []
+
+    def flaky(text, *args):
+        calls.append(text)
+        if text == UTTERANCES[1] and calls.count(text) == 1:
+            return main.Placeholder("Таймаут API"), [main.Placeholder("Сервер не ответил вовремя")], None
+        return generate(text, *args)
+
+    monkeypatch.setattr(main, "generate_slide_data", flaky)
+    batch.build_deck(UTTERANCES, output, [stub()], workers=2, retries=1)
+    assert calls.count(UTTERANCES[1]) == 2
+    assert not any("Таймаут" in slide.shapes.title.text for slide in Presentation(output).slides)
+    assert checkpoint(output) is None
+
+
+def test_failed_slides_stay_out_of_checkpoint_and_resume_regenerates_them(stub, output):
+    batch.build_deck(UTTERANCES, output, [stub(error_rate=1.0)], workers=2, retries=1)
+    # Заглушки попали в презентацию, но не в контрольную точку
+    assert len(Presentation(output).slides) == 3
+    assert checkpoint(output) == []
+
+    url = stub()
+    batch.build_deck(UTTERANCES, output, [url], workers=2, resume=True)
+    titles = [slide.shapes.title.text for slide in Presentation(output).slides]
+    assert len(titles) == 3 and not any("Ошибка" in title for title in titles)
+    assert checkpoint(output) is None
+
+
+def test_resume_skips_finished_slides(stub, output, monkeypatch):
+    entry = main.slide_to_journal("Готовый слайд", ["Пункт"], main.DESIGN_PLACEHOLDER)
+    with open(output + ".checkpoint.jsonl", "w", encoding="utf-8") as f:
+        f.write(json.dumps(dict(entry, index=0), ensure_ascii=False) + "\n")
+    generated = []
+    generate = main.generate_slide_data
+    monkeypatch.setattr(main, "generate_slide_data", lambda text, *args: generated.append(text) or generate(text, *args))
+    batch.build_deck(UTTERANCES, output, [stub()], workers=2, resume=True)
+    assert sorted(generated) == sorted(UTTERANCES[1:])
+    assert Presentation(output).slides[0].shapes.title.text.strip() == "Готовый слайд"
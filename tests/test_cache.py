@@ -0,0 +1,93 @@
+import itertools
+
+import pytest
+
+import cache as cache_module
+import main
+from cache import ResponseCache, open_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время кэша: каждый вызов time.time() на секунду позже."""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(cache_module.time, "time", lambda: next(ticks))
+    return ticks
+
+
+def test_key_ignores_field_order():
+    first = ResponseCache.make_key("generate", {"prompt": "тема", "options": {"temperature": 0.3}})
+    second = ResponseCache.make_key("generate", {"options": {"temperature": 0.3}, "prompt": "тема"})
+    assert first == second
+    assert first != ResponseCache.make_key("design", {"prompt": "тема", "options": {"temperature": 0.3}})
+
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = ResponseCache(None, max_memory_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_disk_entries_survive_restart(tmp_path):
+    path = str(tmp_path / "cache" / "slides.sqlite3")
+    cache = open_cache(path)
+    cache.put("ключ", {"response": "Основы нейронных сетей"})
+    cache.close()
+    reopened = open_cache(path)
+    assert reopened.get("ключ") == {"response": "Основы нейронных сетей"}
+    assert reopened.stats()["disk_hits"] == 1
+    reopened.close()
+
+
+def test_disk_lru_evicts_least_recently_accessed(tmp_path, clock):
+    path = str(tmp_path / "slides.sqlite3")
+    cache = ResponseCache(path, max_memory_entries=1, max_disk_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # с диска: «a» использован позже «b»
+    cache.put("c", 3)
+    cache.close()
+    reopened = ResponseCache(path)
+    assert reopened.get("b") is None
+    assert reopened.get("a") == 1 and reopened.get("c") == 3
+    reopened.close()
+
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    path = str(tmp_path / "slides.sqlite3")
+    cache = ResponseCache(path, ttl=60)
+    cache.put("a", 1)
+    now[0] += 30
+    assert cache.get("a") == 1
+    now[0] += 31
+    assert cache.get("a") is None
+    cache.close()
+    # Устаревшая запись удалена и с диска
+    reopened = ResponseCache(path, ttl=3600)
+    assert reopened.get("a") is None
+    reopened.close()
+
+
+def test_repeated_request_is_served_from_cache(stub, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "CACHE_FILE", str(tmp_path / "slides.sqlite3"))
+    monkeypatch.setattr(main, "_cache", None)
+    client = main.OllamaClient([stub()])
+    try:
+        prompt = main.build_title_prompt("про нейронные сети")
+        first = main.ollama_generate(prompt, 0.3, kind="title", client=client).json()
+        second = main.ollama_generate(prompt, 0.3, kind="title", client=client).json()
+        # Прогрев идёт мимо кэша
+        main.ollama_generate(prompt, 0.3, kind="title", client=client, use_cache=False)
+    finally:
+        client.close()
+        main.get_cache().close()
+    assert first["response"] == second["response"]
+    assert client.endpoints.endpoints[0].requests == 2
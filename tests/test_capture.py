@@ -0,0 +1,114 @@
+import array
+import math
+import random
+import time
+import wave
+
+import pytest
+
+from capture import BufferedSource, CaptureEngine, WavFileSource, rms
+
+RATE = 16000
+
+
+def write_wav(path, parts, channels=1):
+    """parts — список (секунды, амплитуда тона); амплитуда 0 — тихий шум."""
+    rng = random.Random(0)
+    samples = array.array("h")
+    for seconds, amplitude in parts:
+        for i in range(int(seconds * RATE)):
+            value = amplitude * math.sin(2 * math.pi * 440 * i / RATE) if amplitude else rng.randint(-40, 40)
+            samples.extend([int(value)] * channels)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        f.writeframes(samples.tobytes())
+    return path
+
+
+def segments(engine):
+    result = []
+    while True:
+        segment = engine.next_segment()
+        if segment is None:
+            return result
+        result.append(segment)
+
+
+@pytest.fixture
+def speech_wav(tmp_path):
+    return write_wav(str(tmp_path / "speech.wav"), [
+        (1.0, 0), (1.0, 5000), (1.0, 0), (0.5, 5000), (1.0, 0),
+        (0.06, 5000),  # щелчок короче min_phrase_ms
+        (1.0, 0),
+    ])
+
+
+def test_phrases_are_split_on_pauses(speech_wav):
+    engine = CaptureEngine(WavFileSource(speech_wav, realtime=False))
+    found = segments(engine)
+    engine.close()
+    assert len(found) == 2
+    # Начало фразы берётся с запасом preroll_ms, конец — после паузы pause_ms
+    assert found[0].started_at == pytest.approx(0.7, abs=0.1)
+    assert found[0].duration() == pytest.approx(1.0 + 0.3 + 0.7, abs=0.15)
+    assert found[1].started_at == pytest.approx(2.7, abs=0.1)
+    assert engine.noise_level < 100
+    assert all(len(s.pcm) / 2 / RATE == pytest.approx(s.duration()) for s in found)
+
+
+def test_listener_gets_speech_frames_and_reset_on_click(tmp_path):
+    path = write_wav(str(tmp_path / "click.wav"), [(1.0, 0), (0.06, 5000), (1.0, 0), (0.6, 5000), (1.0, 0)])
+
+    class Listener:
+        def __init__(self):
+            self.frames = []
+            self.resets = 0
+
+        def accept(self, frame):
+            self.frames.append(frame)
+
+        def reset(self):
+            self.frames = []
+            self.resets += 1
+
+    engine = CaptureEngine(WavFileSource(path, realtime=False))
+    listener = Listener()
+    segment = engine.next_segment(listener)
+    assert listener.resets == 1
+    assert b"".join(listener.frames) == segment.pcm
+
+
+def test_long_phrase_is_cut_at_max_length(tmp_path):
+    path = write_wav(str(tmp_path / "long.wav"), [(0.6, 0), (3.0, 5000), (0.6, 0)])
+    found = segments(CaptureEngine(WavFileSource(path, realtime=False), max_phrase_seconds=1))
+    # 0.3с запаса + 3с речи + пауза режутся на куски не длиннее секунды
+    assert len(found) == 4
+    assert all(segment.duration() <= 1.0 + 1e-6 for segment in found)
+    assert found[-1].ended_at == pytest.approx(4.2, abs=0.05)
+
+
+def test_stereo_is_mixed_to_mono(tmp_path):
+    path = write_wav(str(tmp_path / "stereo.wav"), [(0.1, 5000)], channels=2)
+    source = WavFileSource(path, realtime=False)
+    frame = source.read()
+    assert len(frame) == source.frame_samples * 2
+    assert rms(frame) > 3000
+
+
+def test_buffered_source_keeps_frames_while_consumer_is_busy(speech_wav):
+    source = BufferedSource(WavFileSource(speech_wav, realtime=False))
+    time.sleep(0.2)  # «распознавание» предыдущей фразы
+    assert source.buffered_seconds() > 1
+    found = segments(CaptureEngine(source))
+    source.close()
+    assert len(found) == 2 and source.dropped_frames == 0
+
+
+def test_buffered_source_drops_oldest_when_full(speech_wav):
+    source = BufferedSource(WavFileSource(speech_wav, realtime=False), max_buffered_seconds=1)
+    source._thread.join(2)
+    assert source.dropped_frames > 0
+    assert source.buffered_seconds() == pytest.approx(1.0, abs=0.05)
+    source.close()
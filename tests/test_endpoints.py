@@ -0,0 +1,75 @@
+import time
+
+import pytest
+import requests
+
+from endpoints import EndpointPool
+
+PAYLOAD = {"model": "test", "prompt": "Выдели тему", "stream": False}
+
+
+def test_requests_go_to_least_loaded_endpoint(stub):
+    urls = [stub(), stub()]
+    pool = EndpointPool(urls)
+    for _ in range(6):
+        assert pool.post(PAYLOAD).status_code == 200
+    assert all(e.requests > 0 for e in pool.endpoints)
+    pool.close()
+
+
+def test_failover_and_circuit_breaker(stub):
+    broken, healthy = stub(error_rate=1.0), stub()
+    pool = EndpointPool([broken, healthy], failure_threshold=2)
+    pool.endpoints[1].latency = 10.0  # пусть первым выбирается сломанный сервер
+    for _ in range(3):
+        assert pool.post(PAYLOAD).status_code == 200
+    stats = pool.stats()
+    assert stats["failovers"] == 2
+    assert not stats["endpoints"][0]["available"]
+    assert stats["endpoints"][0]["requests"] == 2
+    pool.close()
+
+
+def test_open_endpoint_returns_after_probe(stub):
+    broken, healthy = stub(error_rate=1.0), stub()
+    probes = []
+    pool = EndpointPool([broken, healthy], failure_threshold=1, probe_interval=0.05,
+                        probe=lambda url: probes.append(url) or True)
+    pool.endpoints[1].latency = 10.0
+    pool.post(PAYLOAD)
+    deadline = time.monotonic() + 2
+    while not pool.endpoints[0].available() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert pool.endpoints[0].available()
+    assert probes[0] == broken
+    pool.close()
+
+
+def test_all_endpoints_down():
+    pool = EndpointPool(["http://127.0.0.1:9/api/generate"], failure_threshold=1)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        pool.post(PAYLOAD, timeout=1)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        pool.post(PAYLOAD, timeout=1)  # предохранитель разомкнут
+    pool.close()
+
+
+def test_slow_request_is_hedged(stub):
+    slow, fast = stub(latency=2.0), stub()
+    pool = EndpointPool([slow, fast], initial_hedge_delay=0.1)
+    pool.endpoints[1].latency = 10.0
+    started = time.perf_counter()
+    assert pool.post(PAYLOAD, kind="title", hedge=True).status_code == 200
+    assert time.perf_counter() - started < 1.5
+    assert pool.hedges == 1 and pool.hedge_wins == 1
+    pool.close()
+
+
+def test_hedge_delay_follows_p95():
+    pool = EndpointPool(["http://127.0.0.1:9/api/generate"], min_hedge_delay=0.05)
+    assert pool.hedge_delay("title") == pool.initial_hedge_delay
+    for latency in [0.1] * 18 + [0.9] * 2:
+        pool.endpoints[0].outstanding += 1
+        pool._record(pool.endpoints[0], "title", latency)
+    assert pool.hedge_delay("title") == pytest.approx(0.9)
+    pool.close()
@@ -0,0 +1,41 @@
+import requests
+
+from ollama_stub import StubSettings
+
+
+def test_generate_returns_canned_design(stub):
+    url = stub()
+    data = requests.post(url, json={"model": "m", "prompt": "Создай дизайн слайда", "stream": False}).json()
+    assert data["done"] and "Цветовая палитра" in data["response"]
+    assert data["prompt_eval_count"] == 3
+
+
+def test_stream_ends_with_final_chunk(stub):
+    url = stub()
+    response = requests.post(url, json={"model": "m", "prompt": "Тема", "stream": True}, stream=True)
+    lines = [line for line in response.iter_lines() if line]
+    assert len(lines) > 2
+    assert b'"done": true' in lines[-1]
+
+
+def test_error_rate(stub):
+    url = stub(error_rate=1.0)
+    assert requests.post(url, json={"model": "m", "prompt": "Тема", "stream": False}).status_code == 500
+
+
+def test_prompt_prefix_is_taken_from_slot():
+    settings = StubSettings(slots=2)
+    assert settings.evaluate_prompt("инструкция один два текст") == 4
+    assert settings.evaluate_prompt("инструкция один два другой текст") == 2
+    # Промпт целиком в кэше: последний токен всё равно вычисляется
+    assert settings.evaluate_prompt("инструкция один два другой текст") == 1
+
+
+def test_partial_match_keeps_the_matched_slot():
+    settings = StubSettings(slots=2)
+    settings.evaluate_prompt("заголовок инструкции текст")
+    settings.evaluate_prompt("заголовок дизайн инструкции")
+    # Совпадение только в начале: новый промпт ложится в старый слот,
+    # а слот дизайна остаётся
+    assert settings.evaluate_prompt("заголовок инструкции другой") == 1
+    assert settings.evaluate_prompt("заголовок дизайн инструкции тема") == 1
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+
+import pytest
+from pptx import Presentation
+
+from persistence import DeckSaver, PartedDeck, SlideJournal
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "deck.pptx"), str(tmp_path / "deck.pptx.journal")
+
+
+def add_slide(presentation, saver, title):
+    with saver.lock:
+        presentation.slides.add_slide(presentation.slide_layouts[5]).shapes.title.text = title
+        saver.record_slide({"title": title})
+
+
+def test_flush_clears_saved_entries(paths):
+    path, journal_path = paths
+    presentation = Presentation()
+    saver = DeckSaver(presentation, path, debounce=60, max_delay=60, journal=SlideJournal(journal_path))
+    add_slide(presentation, saver, "Первый")
+    add_slide(presentation, saver, "Второй")
+    # position — число слайдов в презентации вместе с записанным
+    assert [e["position"] for e in SlideJournal.load(journal_path)] == [1, 2]
+    assert saver.flush()
+    assert not os.path.exists(journal_path)
+    assert len(Presentation(path).slides) == 2
+    saver.close()
+
+
+def test_slide_added_during_save_stays_in_journal(paths):
+    path, journal_path = paths
+    presentation = Presentation()
+    journal = SlideJournal(journal_path)
+    added = []
+
+    class Deck:
+        # Слайд добавляется сразу после снимка, как из другого потока
+        slides = presentation.slides
+
+        @staticmethod
+        def save(buffer):
+            presentation.save(buffer)
+            if not added:
+                added.append(True)
+                add_slide(presentation, saver, "Во время сохранения")
+
+    saver = DeckSaver(Deck, path, debounce=60, max_delay=60, journal=journal)
+    add_slide(presentation, saver, "Первый")
+    assert saver.flush()
+    assert [e["title"] for e in journal.pending()] == ["Во время сохранения"]
+    assert saver.flush()
+    assert journal.pending() == []
+    saver.close()
+
+
+def test_discard_saved_skips_entries_already_in_file(paths):
+    _, journal_path = paths
+    journal = SlideJournal(journal_path)
+    for position, title in enumerate(["Первый", "Второй", "Третий"], start=1):
+        journal.append({"title": title, "position": position})
+    # Сбой после записи .pptx с двумя слайдами, но до очистки журнала
+    assert SlideJournal(journal_path).discard_saved(2) == 2
+    assert [e["title"] for e in SlideJournal.load(journal_path)] == ["Третий"]
+
+
+def test_journal_ignores_torn_last_line(paths):
+    _, journal_path = paths
+    with open(journal_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"title": "Целый"}, ensure_ascii=False) + "\n{\"title\": \"Обор")
+    assert SlideJournal.load(journal_path) == [{"title": "Целый"}]
+
+
+def test_concurrent_flushes_are_serialized(paths):
+    path, journal_path = paths
+    presentation = Presentation()
+    saver = DeckSaver(presentation, path, debounce=60, max_delay=60, journal=SlideJournal(journal_path))
+    for i in range(3):
+        add_slide(presentation, saver, f"Слайд {i}")
+    threads = [threading.Thread(target=saver.flush) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert saver.failures == 0
+    assert not os.path.exists(journal_path)
+    assert len(Presentation(path).slides) == 3
+    saver.close()
+
+
+def titles(path):
+    return [slide.shapes.title.text for slide in Presentation(path).slides]
+
+
+def parted_deck(path, **options):
+    def open_base():
+        return Presentation(path) if os.path.exists(path) else Presentation()
+
+    def replay(presentation, entry):
+        presentation.slides.add_slide(presentation.slide_layouts[5]).shapes.title.text = entry["title"]
+
+    return PartedDeck(path, Presentation, open_base, replay, debounce=60, max_delay=60, **options)
+
+
+def add_part_slide(deck, title):
+    with deck.lock:
+        presentation = deck.presentation
+        presentation.slides.add_slide(presentation.slide_layouts[5]).shapes.title.text = title
+        deck.record_slide({"title": title})
+
+
+def test_parts_roll_over_at_max_slides(paths):
+    path, _ = paths
+    deck = parted_deck(path, max_slides=2)
+    for i in range(5):
+        add_part_slide(deck, f"Слайд {i}")
+    assert deck.parts == 3
+    assert deck.slide_count() == 5
+    deck.flush()
+    for thread in deck._retiring:
+        thread.join()
+    assert [len(Presentation(part).slides) for part in deck.part_paths()] == [2, 2, 1]
+    assert deck.close()
+    assert titles(path) == [f"Слайд {i}" for i in range(5)]
+    assert deck.part_paths() == [] and deck.log.pending() == []
+
+
+def test_close_appends_to_existing_base(paths):
+    path, _ = paths
+    base = Presentation()
+    for title in ["Старый 1", "Старый 2"]:
+        base.slides.add_slide(base.slide_layouts[5]).shapes.title.text = title
+    base.save(path)
+    deck = parted_deck(path, max_slides=2)
+    for i in range(3):
+        add_part_slide(deck, f"Новый {i}")
+    assert deck.close()
+    assert titles(path) == ["Старый 1", "Старый 2", "Новый 0", "Новый 1", "Новый 2"]
+
+
+def test_merge_after_crash_does_not_duplicate_slides(paths, monkeypatch):
+    path, _ = paths
+    Presentation().save(path)
+    deck = parted_deck(path, max_slides=2)
+    for i in range(3):
+        add_part_slide(deck, f"Слайд {i}")
+    # Сбой после записи основного файла, но до очистки журнала частей
+    monkeypatch.setattr(SlideJournal, "mark_saved", lambda journal, count: None)
+    assert deck.close()
+    assert len(titles(path)) == 3
+    monkeypatch.undo()
+
+    restarted = parted_deck(path)
+    assert restarted.slide_count() == 3  # записи журнала пережили сбой
+    assert restarted.merge()
+    assert titles(path) == ["Слайд 0", "Слайд 1", "Слайд 2"]
+    assert restarted.log.pending() == []
+    assert not os.path.exists(restarted.log.path)
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import SlidePipeline, Utterance, UtteranceQueue
+
+
+def texts(queue):
+    queue.close()
+    result = []
+    while True:
+        utterance = queue.get()
+        if utterance is None:
+            return result
+        result.append(utterance.text)
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        UtteranceQueue(overflow="ignore")
+
+
+def test_merge_overflow_glues_into_last_phrase():
+    queue = UtteranceQueue(maxsize=2, overflow="merge")
+    for text in ["один", "два", "три", "четыре"]:
+        assert queue.put(Utterance(text))
+    assert texts(queue) == ["один", "два три четыре"]
+    assert queue.stats()["merged"] == 2
+
+
+def test_drop_oldest_overflow():
+    queue = UtteranceQueue(maxsize=2, overflow="drop_oldest")
+    for text in ["один", "два", "три"]:
+        queue.put(Utterance(text))
+    assert texts(queue) == ["два", "три"]
+    assert queue.stats()["dropped"] == 1
+
+
+def test_block_overflow_waits_for_free_slot():
+    queue = UtteranceQueue(maxsize=1, overflow="block")
+    queue.put(Utterance("один"))
+    done = threading.Event()
+
+    def producer():
+        queue.put(Utterance("два"))
+        done.set()
+
+    threading.Thread(target=producer, daemon=True).start()
+    assert not done.wait(0.1)
+    assert queue.get().text == "один"
+    assert done.wait(1)
+    assert queue.get().text == "два"
+
+
+def test_block_overflow_returns_false_when_closed():
+    queue = UtteranceQueue(maxsize=1, overflow="block")
+    queue.put(Utterance("один"))
+    result = []
+    thread = threading.Thread(target=lambda: result.append(queue.put(Utterance("два"))))
+    thread.start()
+    time.sleep(0.05)
+    queue.close()
+    thread.join(1)
+    assert result == [False]
+
+
+def test_stale_phrase_is_merged_with_fresher_one():
+    queue = UtteranceQueue(maxsize=4, stale_after=1.0)
+    queue.put(Utterance("старая", captured_at=time.monotonic() - 5))
+    queue.put(Utterance("новая"))
+    utterance = queue.get()
+    assert utterance.text == "старая новая"
+    assert utterance.seq == 0
+
+
+def test_stale_phrase_is_dropped_with_drop_oldest():
+    queue = UtteranceQueue(maxsize=4, overflow="drop_oldest", stale_after=1.0)
+    queue.put(Utterance("старая", captured_at=time.monotonic() - 5))
+    queue.put(Utterance("новая"))
+    assert queue.get().text == "новая"
+    assert queue.stats()["dropped"] == 1
+
+
+def test_last_stale_phrase_is_still_served():
+    queue = UtteranceQueue(stale_after=1.0)
+    queue.put(Utterance("старая", captured_at=time.monotonic() - 5))
+    assert queue.get().text == "старая"
+
+
+def run_pipeline(capture, **options):
+    written = []
+    pipeline = SlidePipeline(capture, lambda text: text, lambda utterance, result: written.append(result),
+                             capture_backoff=0.01, **options).start()
+    assert pipeline.join(timeout=2)
+    return pipeline, written
+
+
+def test_capture_failures_stop_the_pipeline():
+    calls = []
+
+    def capture():
+        calls.append(time.monotonic())
+        raise OSError("устройство недоступно")
+
+    pipeline, _ = run_pipeline(capture, max_capture_failures=3)
+    assert len(calls) == 3
+    assert isinstance(pipeline.capture_error, OSError)
+    # Между попытками есть пауза, и она растёт
+    assert calls[2] - calls[1] > calls[1] - calls[0] >= 0.01
+
+
+def test_import_error_stops_capture_at_once():
+    calls = []
+
+    def capture():
+        calls.append(1)
+        raise ImportError("нет PyAudio")
+
+    pipeline, _ = run_pipeline(capture)
+    assert len(calls) == 1
+    assert isinstance(pipeline.capture_error, ImportError)
+
+
+def test_successful_capture_resets_failure_count():
+    results = iter([OSError(), OSError(), "первая", OSError(), OSError(), "вторая", None])
+
+    def capture():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    pipeline, written = run_pipeline(capture, max_capture_failures=3)
+    assert pipeline.capture_error is None
+    assert written == ["первая", "вторая"]
@@ -0,0 +1,50 @@
+from router import KeywordRouter, normalize
+
+SECTIONS = [
+    {"keywords": ["нейронные сети", "искусственный интеллект", "обучение модели"], "title": "Нейросети"},
+    {"keywords": ["машинное обучение", "ML"], "title": "Машинное обучение"},
+]
+
+
+def test_normalize_matches_word_forms():
+    assert normalize("нейронных сетях") == normalize("Нейронные сети")
+    assert normalize("Ёлка") == normalize("елка")
+
+
+def test_two_keywords_route_to_section():
+    router = KeywordRouter(SECTIONS)
+    section = router.match("сегодня про нейронные сети и искусственный интеллект в медицине")
+    assert section["title"] == "Нейросети"
+
+
+def test_single_mention_in_long_phrase_is_not_a_hit():
+    router = KeywordRouter(SECTIONS)
+    assert router.match("в конце доклада я немного упомяну нейронные сети и покажу примеры") is None
+
+
+def test_short_phrase_covered_by_keyword_is_a_hit():
+    router = KeywordRouter(SECTIONS)
+    assert router.match("машинное обучение")["title"] == "Машинное обучение"
+
+
+def test_tie_between_sections_is_not_a_hit():
+    router = KeywordRouter(SECTIONS)
+    assert router.match("нейронные сети или машинное обучение") is None
+
+
+def test_keyword_inside_another_match_is_found():
+    # «обучение модели» начинается внутри уже совпавшей «машинное обучение»:
+    # без ссылок неудач автомат пропустил бы его, и разделы сравнялись бы
+    router = KeywordRouter(SECTIONS)
+    section = router.match("машинное обучение модели на нейронных сетях")
+    assert section["title"] == "Нейросети"
+
+
+def test_same_section_is_not_served_twice_in_a_row():
+    router = KeywordRouter(SECTIONS)
+    phrase = "нейронные сети и искусственный интеллект"
+    assert router.match(phrase) is not None
+    assert router.match(phrase) is None
+    assert router.match("машинное обучение")["title"] == "Машинное обучение"
+    assert router.match(phrase)["title"] == "Нейросети"
+    assert router.hits == 3 and router.lookups == 4
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from scheduler import FairScheduler, QueueFull
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = FairScheduler(workers=1, session_queue_size=3, max_pending=5)
+    yield scheduler
+    scheduler.close()
+
+
+def blocked(scheduler):
+    """Занимает единственный поток, пока не выставлено событие."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    future = scheduler.submit("hold", hold)
+    assert started.wait(1)
+    return release, future
+
+
+def test_sessions_are_served_round_robin(scheduler):
+    release, _ = blocked(scheduler)
+    order = []
+    futures = [scheduler.submit("noisy", order.append, f"noisy-{i}") for i in range(3)]
+    futures.append(scheduler.submit("quiet", order.append, "quiet-0"))
+    release.set()
+    for future in futures:
+        future.result(1)
+    # Шумная сессия не обгоняет тихую больше чем на одну задачу
+    assert order == ["noisy-0", "quiet-0", "noisy-1", "noisy-2"]
+
+
+def test_session_queue_overflow_raises_queue_full(scheduler):
+    release, _ = blocked(scheduler)
+    for i in range(3):
+        scheduler.submit("noisy", lambda: None)
+    with pytest.raises(QueueFull):
+        scheduler.submit("noisy", lambda: None)
+    assert scheduler.session_stats("noisy")["rejected"] == 1
+    # Другая сессия со своей очередью по-прежнему принимается
+    scheduler.submit("quiet", lambda: None)
+    release.set()
+    assert scheduler.drain("noisy", timeout=1)
+
+
+def test_service_wide_limit(scheduler):
+    release, _ = blocked(scheduler)
+    for session in ("a", "b"):
+        for i in range(2):
+            scheduler.submit(session, lambda: None)
+    scheduler.submit("c", lambda: None)
+    with pytest.raises(QueueFull):
+        scheduler.submit("d", lambda: None)
+    release.set()
+
+
+def test_exceptions_reach_the_future(scheduler):
+    def fail():
+        raise RuntimeError("сбой")
+
+    with pytest.raises(RuntimeError):
+        scheduler.submit("a", fail).result(1)
+    assert scheduler.session_stats("a")["completed"] == 1
+
+
+def test_close_cancels_pending_jobs():
+    scheduler = FairScheduler(workers=1)
+    release, _ = blocked(scheduler)
+    pending = scheduler.submit("a", lambda: None)
+    threading.Timer(0.05, release.set).start()
+    scheduler.close()
+    assert pending.cancelled()
+    with pytest.raises(RuntimeError):
+        scheduler.submit("a", lambda: None)
@@ -0,0 +1,23 @@
+from pptx import Presentation
+
+import main
+from metrics import tracer
+
+
+def test_streamed_slide_reports_first_bullet(stub, monkeypatch):
+    monkeypatch.setattr(main, "CACHE_ENABLED", False)
+    client = main.OllamaClient([stub(token_rate=200)])
+    tracer.configure(True)
+    try:
+        tracer.new_trace()
+        streamed = main.StreamedSlide("про нейронные сети", client=client).start()
+        title, content, design = main.stream_slide(Presentation(), streamed.text, events=streamed.events())
+        assert "first_bullet" in tracer.render_prometheus()
+    finally:
+        tracer.configure(False)
+        client.close()
+    assert title and len(content) == 3
+    assert not main.is_placeholder_slide(title, content, design)
+    assert 0 < streamed.timings["first_bullet"] < streamed.timings["total"]
+    # Запросы шли через переданный клиент, а не через общий
+    assert sum(e.requests for e in client.endpoints.endpoints) == 3
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import main
+
+VALID = {
+    "title": 'Основы "нейросетей"',
+    "bullets": ["Определение", "  ", "Архитектура", 3],
+    "palette": {"main": "#FAFAFA", "accent": "8FA6B8"},
+    "fonts": {"title": "Montserrat Light", "text": ""},
+    "background": "минималистичный",
+}
+
+
+def test_valid_slide():
+    title, lines, design = main.validate_structured_slide(VALID)
+    assert title == "Основы нейросетей"
+    assert lines == ["Определение", "Архитектура", "3"]
+    assert design["title_font"] == "Montserrat Light"
+    assert design["text_font"] is None
+    assert tuple(design["main_color"]) == (250, 250, 250)
+    assert tuple(design["accent_color"]) == (0, 0, 0)  # цвет без # не распознан — по умолчанию
+    assert design["background_idea"] == "минималистичный"
+
+
+@pytest.mark.parametrize("data", [
+    None,
+    [],
+    {"bullets": ["Пункт"]},
+    {"title": "  ", "bullets": ["Пункт"]},
+    {"title": "Тема", "bullets": "Пункт"},
+    {"title": "Тема", "bullets": [" ", ""]},
+    {"title": "Тема", "bullets": ["Пункт"], "fonts": {"title": 5}},
+    {"title": "Тема", "bullets": ["Пункт"], "palette": {"main": ["#FFFFFF"]}},
+    {"title": "Тема", "bullets": ["Пункт"], "background": {"цвет": "белый"}},
+])
+def test_invalid_slide_raises(data):
+    with pytest.raises(ValueError):
+        main.validate_structured_slide(data)
+
+
+def test_missing_design_gets_defaults():
+    _, _, design = main.validate_structured_slide({"title": "Тема", "bullets": ["Пункт"], "palette": "синий"})
+    assert design["main_color"] is not None and design["accent_color"] is not None
+
+
+def test_structured_generation_against_stub(stub, monkeypatch):
+    monkeypatch.setattr(main, "CACHE_ENABLED", False)
+    client = main.OllamaClient([stub()])
+    try:
+        title, lines, design = main.generate_slide_data_structured("про нейронные сети", {}, client=client)
+    finally:
+        client.close()
+    assert title and len(lines) == 3 and design["title_font"] == "Montserrat Light"
+
+
+def test_bad_font_type_falls_back_to_three_prompts(stub, monkeypatch):
+    monkeypatch.setattr(main, "CACHE_ENABLED", False)
+    monkeypatch.setattr(main, "STRUCTURED_GENERATION", True)
+    url = stub()
+    client = main.OllamaClient([url])
+    original = main.ollama_generate
+
+    def bad_fonts(prompt, temperature, response_format=None, *args, **kwargs):
+        response = original(prompt, temperature, response_format, *args, **kwargs)
+        if response_format is not None:
+            data = response.json()
+            data["response"] = json.dumps({"title": "Тема", "bullets": ["Пункт"], "fonts": {"title": 5}})
+            response.json = lambda: data
+        return response
+
+    monkeypatch.setattr(main, "ollama_generate", bad_fonts)
+    try:
+        title, lines, _ = main.generate_slide_data("про нейронные сети", client=client)
+    finally:
+        client.close()
+    assert not main.is_placeholder_slide(title, lines)
+    assert len(lines) == 3  # ответ трёх отдельных запросов к замене
@@ -0,0 +1,83 @@
+import io
+
+import pytest
+from pptx import Presentation
+from pptx.dml.color import RGBColor
+
+import main
+from router import KeywordRouter
+from theme import apply_deck_theme, deck_theme_applied, read_deck_theme, read_file_theme
+
+DESIGN = {
+    'main_color': RGBColor(0xFA, 0xFA, 0xFA),
+    'accent_color': RGBColor(0x8F, 0xA6, 0xB8),
+    'title_font': "Montserrat Light",
+    'text_font': "Open Sans",
+}
+
+
+def reopened(presentation):
+    buffer = io.BytesIO()
+    presentation.save(buffer)
+    buffer.seek(0)
+    return Presentation(buffer)
+
+
+def test_theme_round_trip(tmp_path):
+    presentation = Presentation()
+    assert not deck_theme_applied(presentation)
+    assert read_deck_theme(presentation) is None
+    apply_deck_theme(presentation, DESIGN)
+    presentation = reopened(presentation)
+    assert deck_theme_applied(presentation)
+    assert read_deck_theme(presentation) == DESIGN
+    path = str(tmp_path / "deck.pptx")
+    presentation.save(path)
+    assert read_file_theme(path) == DESIGN
+
+
+def test_theme_can_be_rewritten():
+    presentation = Presentation()
+    apply_deck_theme(presentation, DESIGN)
+    dark = dict(DESIGN, main_color=RGBColor(0x20, 0x20, 0x20), title_font="Raleway")
+    apply_deck_theme(presentation, dark)
+    assert read_deck_theme(reopened(presentation)) == dark
+
+
+def test_config_design_is_converted():
+    design = main.design_from_config({"main_color": "fafafa", "accent_color": "#336699",
+                                      "title_font": " Raleway "})
+    assert design['main_color'] == RGBColor(0xFA, 0xFA, 0xFA)
+    assert design['accent_color'] == RGBColor(0x33, 0x66, 0x99)
+    assert design['title_font'] == "Raleway" and design['text_font'] is None
+    assert design['background_idea'] is None
+
+
+@pytest.mark.parametrize("config_design", [
+    "синий",
+    {"main_color": "синий"},
+    {"accent_color": 0xFAFAFA},
+    {"title_font": 5},
+])
+def test_bad_config_design_raises(config_design):
+    with pytest.raises(ValueError):
+        main.design_from_config(config_design)
+
+
+def test_routed_slide_with_config_design_is_rendered_and_journaled():
+    router = KeywordRouter([{
+        "keywords": ["нейронные сети"], "title": "Нейросети", "content": ["Пункт"],
+        "design": {"main_color": "FAFAFA", "accent_color": "#8FA6B8", "title_font": "Raleway"},
+    }])
+    title, content, design = main.route_slide(router, "нейронные сети")
+    presentation = Presentation()
+    slide = main.create_slide(presentation, title, content, design)
+    assert slide.background.fill.fore_color.rgb == RGBColor(0xFA, 0xFA, 0xFA)
+    restored = main.slide_from_journal(main.slide_to_journal(title, content, design))
+    assert restored[2]['main_color'] == design['main_color']
+
+
+def test_routed_slide_with_bad_design_inherits_theme():
+    router = KeywordRouter([{"keywords": ["нейронные сети"], "title": "Нейросети",
+                             "design": {"main_color": "синий"}}])
+    assert main.route_slide(router, "нейронные сети")[2] is None
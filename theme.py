@@ -0,0 +1,123 @@
+import zipfile
+
+from lxml import etree
+
+# Имя темы, по которому видно, что оформление уже записано в презентацию
+THEME_NAME = "AutoPresentation"
+
+_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+
+
+def contrast_text_color(main_color):
+    """Чёрный текст на светлом фоне, белый — на тёмном."""
+    from pptx.dml.color import RGBColor
+    brightness = sum([main_color[0], main_color[1], main_color[2]]) / 3
+    return RGBColor(0, 0, 0) if brightness > 128 else RGBColor(255, 255, 255)
+
+
+def _theme_part(presentation):
+    from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+    return presentation.slide_master.part.part_related_by(RT.THEME)
+
+
+def deck_theme_applied(presentation):
+    """Проверяет, записана ли уже тема оформления в презентацию."""
+    try:
+        theme = etree.fromstring(_theme_part(presentation).blob)
+    except (KeyError, etree.XMLSyntaxError):
+        return False
+    return theme.get("name") == THEME_NAME
+
+
+def read_deck_theme(presentation):
+    """Возвращает дизайн, записанный в тему apply_deck_theme, или None."""
+    try:
+        return _design_from_theme(_theme_part(presentation).blob)
+    except (KeyError, etree.XMLSyntaxError):
+        return None
+
+
+def read_file_theme(path):
+    """Как read_deck_theme, но читает тему прямо из .pptx, не разбирая слайды."""
+    try:
+        with zipfile.ZipFile(path) as package:
+            return _design_from_theme(package.read("ppt/theme/theme1.xml"))
+    except (OSError, KeyError, zipfile.BadZipFile, etree.XMLSyntaxError):
+        return None
+
+
+def _design_from_theme(blob):
+    from pptx.dml.color import RGBColor
+    theme = etree.fromstring(blob)
+    if theme.get("name") != THEME_NAME:
+        return None
+    design = {'main_color': None, 'accent_color': None, 'title_font': None, 'text_font': None}
+    for key, slot in (('main_color', "lt1"), ('accent_color', "accent1")):
+        color = theme.find(f"{{{_A}}}themeElements/{{{_A}}}clrScheme/{{{_A}}}{slot}/{{{_A}}}srgbClr")
+        if color is not None:
+            design[key] = RGBColor.from_string(color.get("val"))
+    for key, kind in (('title_font', "majorFont"), ('text_font', "minorFont")):
+        latin = theme.find(f"{{{_A}}}themeElements/{{{_A}}}fontScheme/{{{_A}}}{kind}/{{{_A}}}latin")
+        if latin is not None and latin.get("typeface"):
+            design[key] = latin.get("typeface")
+    return design
+
+
+def _set_scheme_color(clr_scheme, slot, color):
+    """Заменяет цвет слота схемы (dk1, lt1, accent1, ...) на явный RGB."""
+    element = clr_scheme.find(f"{{{_A}}}{slot}")
+    if element is None:
+        element = etree.SubElement(clr_scheme, f"{{{_A}}}{slot}")
+    for child in list(element):
+        element.remove(child)
+    etree.SubElement(element, f"{{{_A}}}srgbClr", val=str(color))
+
+
+def _set_scheme_font(font_scheme, kind, typeface):
+    latin = font_scheme.find(f"{{{_A}}}{kind}/{{{_A}}}latin")
+    if latin is not None and typeface:
+        latin.set("typeface", typeface)
+
+
+def _use_accent_for_titles(slide_master):
+    """Переключает цвет заголовков в образце слайдов на акцентный цвет темы."""
+    for def_rpr in slide_master._element.iterfind(f".//{{{_P}}}titleStyle//{{{_A}}}defRPr"):
+        fill = def_rpr.find(f"{{{_A}}}solidFill")
+        if fill is None:
+            fill = etree.Element(f"{{{_A}}}solidFill")
+            def_rpr.insert(0, fill)
+        for child in list(fill):
+            fill.remove(child)
+        etree.SubElement(fill, f"{{{_A}}}schemeClr", val="accent1")
+
+
+def apply_deck_theme(presentation, design):
+    """Записывает палитру и шрифты дизайна в тему и образец слайдов.
+
+    Фон берётся из lt1 (bg1), текст — из dk1 (tx1), заголовки — из accent1,
+    шрифт заголовков — из majorFont, основного текста — из minorFont.
+    Слайды, у которых нет собственного оформления, наследуют всё это.
+    """
+    main_color = design['main_color']
+    accent_color = design['accent_color']
+    text_color = contrast_text_color(main_color)
+
+    part = _theme_part(presentation)
+    theme = etree.fromstring(part.blob)
+    theme.set("name", THEME_NAME)
+    clr_scheme = theme.find(f"{{{_A}}}themeElements/{{{_A}}}clrScheme")
+    if clr_scheme is not None:
+        _set_scheme_color(clr_scheme, "dk1", text_color)
+        _set_scheme_color(clr_scheme, "lt1", main_color)
+        _set_scheme_color(clr_scheme, "accent1", accent_color)
+    font_scheme = theme.find(f"{{{_A}}}themeElements/{{{_A}}}fontScheme")
+    if font_scheme is not None:
+        _set_scheme_font(font_scheme, "majorFont", design.get('title_font'))
+        _set_scheme_font(font_scheme, "minorFont", design.get('text_font'))
+    # Часть темы python-pptx хранит как сырые байты, подменяем их целиком
+    part._blob = etree.tostring(theme, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+    _use_accent_for_titles(presentation.slide_master)
+    print(f"🎨 Тема презентации: фон #{main_color}, заголовки #{accent_color}, "
+          f"шрифты {design.get('title_font') or 'default'} / {design.get('text_font') or 'default'}")